@@ -4,20 +4,34 @@
 
 from enum import unique
 import json
+from datetime import timedelta
 from operator import itemgetter
-from os import abort
+import bisect
 import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for, jsonify
+import babel.dates
+from functools import lru_cache
+from flask import Flask, abort, render_template, request, Response, flash, redirect, url_for, jsonify, stream_with_context
+import sqlalchemy as sa
 from sqlalchemy.orm import backref
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
-import logging
-from logging import Formatter, FileHandler
 import re
+import os
+import gzip
+import threading
+import click
+from werkzeug.datastructures import MultiDict
+import time
 from flask_migrate import Migrate, current
 from flask_wtf import Form
 from forms import *
+from cache import PageCache
+import logs
+import metrics
+import query_stats
+import bulk
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
@@ -25,9 +39,16 @@ from forms import *
 app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object('config')
+logs.init_app(app)
+if 'pool_size' in app.config['SQLALCHEMY_ENGINE_OPTIONS']:
+  app.config['SQLALCHEMY_ENGINE_OPTIONS'].setdefault('poolclass', metrics.InstrumentedQueuePool)
 db = SQLAlchemy(app)
+metrics.register_pool_gauges(lambda: db.engine.pool)
 
 migrate = Migrate(app, db)
+query_stats.init_app(app)
+metrics.init_app(app)
+page_cache = PageCache(app)
 
 #----------------------------------------------------------------------------#
 # Models.
@@ -36,20 +57,41 @@ class Genre(db.Model):
     __tablename__ = 'Genre'
     
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
+    name = db.Column(db.String, unique=True, index=True)
     
+# The composite primary keys lead with genre_id, so lookups by artist/venue
+# alone need their own index.
 artist_genre_table = db.Table('artist_genre_table',
     db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
-    db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id'), primary_key=True)
+    db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id'), primary_key=True),
+    db.Index('ix_artist_genre_table_artist_id', 'artist_id')
 )
 
 venue_genre_table = db.Table('venue_genre_table',
     db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
-    db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id'), primary_key=True)
+    db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id'), primary_key=True),
+    db.Index('ix_venue_genre_table_venue_id', 'venue_id')
 )
 
+def trigram_indexes(table, *columns):
+    # GIN pg_trgm indexes backing the ILIKE name search on Postgres
+    # (migrations b3d3e3edc0b3, 7c2e4f9a1d35); other backends get a plain
+    # index of the same name. City and state are filtered by equality and
+    # use ix_*_state_city instead.
+    return tuple(
+        db.Index(f'ix_{table}_{column}_trgm', column,
+                 postgresql_using='gin',
+                 postgresql_ops={column: 'gin_trgm_ops'})
+        for column in columns
+    )
+
 class Venue(db.Model):
     __tablename__ = 'Venue'
+    __table_args__ = trigram_indexes('Venue', 'name') + (
+        # Rebuilding one area's summary reads only that area's venues;
+        # also serves state/city search filters and facet counts.
+        db.Index('ix_Venue_state_city', 'state', 'city'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
@@ -67,12 +109,21 @@ class Venue(db.Model):
     seeking_description = db.Column(db.String(500))
     shows = db.relationship('Show', backref='venue', lazy=True)
 
+    # Denormalized from Show, see refresh_show_counters().
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_show_at = db.Column(db.DateTime, index=True)
+
     def __repr__(self):
         return f'<Venue {self.id} {self.name}>'
 
 
 class Artist(db.Model):
     __tablename__ = 'Artist'
+    __table_args__ = trigram_indexes('Artist', 'name') + (
+        # State/city search filters and facet counts.
+        db.Index('ix_Artist_state_city', 'state', 'city'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
@@ -91,11 +142,21 @@ class Artist(db.Model):
 
     shows = db.relationship('Show', backref='artist', lazy=True)
 
+    # Denormalized from Show, see refresh_show_counters().
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_show_at = db.Column(db.DateTime, index=True)
+
     def __repr__(self):
         return f'<Artist {self.id} {self.name}>'
     
 class Show(db.Model):
   __tablename__ = 'Show'
+  __table_args__ = (
+      db.Index('ix_Show_venue_id_starting_time', 'venue_id', 'starting_time'),
+      db.Index('ix_Show_artist_id_starting_time', 'artist_id', 'starting_time'),
+      db.Index('ix_Show_starting_time_id', 'starting_time', 'id'),
+  )
 
   id = db.Column(db.Integer, primary_key=True)
   starting_time = db.Column(db.DateTime, nullable=False)
@@ -106,20 +167,907 @@ class Show(db.Model):
         return f'<Show {self.id} {self.starting_time} artist_id={self.artist_id} venue_id={self.venue_id}>'
 
 
+class CacheVersion(db.Model):
+  __tablename__ = 'cache_version'
+
+  # One row per in-process cache; writers bump the counter in the same
+  # transaction as the change so every worker can spot stale copies.
+  name = db.Column(db.String(64), primary_key=True)
+  version = db.Column(db.Integer, nullable=False, default=0)
+
+  def __repr__(self):
+        return f'<CacheVersion {self.name} {self.version}>'
+
+
+class AreaSummary(db.Model):
+  __tablename__ = 'area_summary'
+
+  # Materialized from Venue by refresh_areas(): one row per (state, city)
+  # holding its venues as [id, name, upcoming_shows_count] lists, so the
+  # venues directory and area pages never scan the Venue table.
+  state = db.Column(db.String(120), primary_key=True)
+  city = db.Column(db.String(120), primary_key=True)
+  venues_count = db.Column(db.Integer, nullable=False, default=0)
+  upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0)
+  venues = db.Column(db.JSON, nullable=False)
+
+  def __repr__(self):
+        return f'<AreaSummary {self.city}, {self.state} venues={self.venues_count}>'
+
+
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
+DATETIME_PATTERNS = {
+    'full': babel.dates.parse_pattern("EEEE MMMM, d, y 'at' h:mma"),
+    'medium': babel.dates.parse_pattern("EE MM, dd, y h:mma"),
+}
+DATETIME_LOCALE = babel.Locale.parse('en')
+
+@lru_cache(maxsize=4096)
+def format_datetime_cached(value, format):
+  # Listings repeat the same timestamps a lot; the named styles use
+  # patterns compiled once at import instead of being re-parsed per call.
+  pattern = DATETIME_PATTERNS.get(format) or babel.dates.parse_pattern(format)
+  return pattern.apply(value, DATETIME_LOCALE)
+
 def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format, locale='en')
+  if not isinstance(value, datetime):
+    value = dateutil.parser.parse(value)
+  return format_datetime_cached(value, format)
 
 app.jinja_env.filters['datetime'] = format_datetime
 
+#----------------------------------------------------------------------------#
+# Caches.
+#----------------------------------------------------------------------------#
+
+def current_cache_version(name):
+  return db.session.query(CacheVersion.version).filter_by(name=name).scalar() or 0
+
+def bump_cache_version(name):
+  """Mark cache ``name`` as changed by the current transaction.
+
+  The version itself is incremented when the transaction commits
+  (bump_cache_versions), so every writer takes the shared cache_version
+  rows last, after its own rows, and holds them only while it commits.
+  """
+  # Begin the transaction if nothing has yet, so a rollback drops the mark.
+  db.session.connection()
+  db.session.info.setdefault('cache_versions', set()).add(name)
+
+@sa.event.listens_for(db.session, 'before_commit')
+def bump_cache_versions(session):
+  """Increment the versions marked by bump_cache_version, in name order.
+
+  The rows are not seeded, so on Postgres and SQLite each bump is one
+  ``INSERT ... ON CONFLICT (name) DO UPDATE``: two first writers of a name
+  then serialize on the row instead of one failing on the primary key.
+  """
+  names = session.info.pop('cache_versions', None)
+  if not names:
+    return
+  # Pending changes first, so the version rows are the last ones locked.
+  session.flush()
+
+  inserts = {'postgresql': pg_insert, 'sqlite': sqlite_insert}
+  insert = inserts.get(session.get_bind().dialect.name)
+  for name in sorted(names):
+    if insert:
+      statement = insert(CacheVersion.__table__).values(name=name, version=1)
+      session.execute(statement.on_conflict_do_update(
+          index_elements=['name'], set_={'version': CacheVersion.__table__.c.version + 1}
+      ))
+      continue
+    updated = session.query(CacheVersion).filter_by(name=name).update(
+        {CacheVersion.version: CacheVersion.version + 1}, synchronize_session=False
+    )
+    if not updated:
+      session.add(CacheVersion(name=name, version=1))
+  session.flush()
+
+@sa.event.listens_for(db.session, 'after_soft_rollback')
+def forget_cache_versions(session, previous_transaction):
+  session.info.pop('cache_versions', None)
+
+class GenreCache:
+  """Process-wide genre id <-> name map.
+
+  Loaded at startup by wsgi.py, before gunicorn forks (on first use under
+  `flask run`), and reloaded whenever the ``genres`` row in
+  ``cache_version`` moves. The version is re-checked at most once every
+  ``CACHE_VERSION_CHECK_INTERVAL`` seconds, so a worker pays one primary-key
+  lookup per interval to notice genres added by another process.
+  """
+
+  def __init__(self):
+    self.by_id = {}
+    self.by_name = {}
+    self.version = None
+    self.checked_at = 0.0
+    self.lock = threading.Lock()
+
+  def load(self):
+    with self.lock:
+      version = current_cache_version('genres')
+      rows = db.session.query(Genre.id, Genre.name).all()
+      self.by_id = dict(rows)
+      self.by_name = {name: genre_id for genre_id, name in rows}
+      self.version = version
+      self.checked_at = time.monotonic()
+
+  def refresh(self):
+    interval = app.config['CACHE_VERSION_CHECK_INTERVAL']
+    if self.version is not None and time.monotonic() - self.checked_at < interval:
+      return
+
+    if self.version is None or current_cache_version('genres') != self.version:
+      metrics.cache_requests.inc('genres', 'miss')
+      self.load()
+    else:
+      metrics.cache_requests.inc('genres', 'hit')
+      self.checked_at = time.monotonic()
+
+  def invalidate(self):
+    # Due on the next use whatever CACHE_VERSION_CHECK_INTERVAL is.
+    self.checked_at = float('-inf')
+
+  def lookup(self, genre_ids):
+    """``{id: name}`` for ``genre_ids``; unknown ids are skipped."""
+    self.refresh()
+    if any(genre_id not in self.by_id for genre_id in genre_ids):
+      metrics.cache_requests.inc('genres', 'miss')
+      self.load()
+    return {genre_id: self.by_id[genre_id] for genre_id in genre_ids if genre_id in self.by_id}
+
+  def names(self, genre_ids):
+    """Genre names for ``genre_ids``, sorted for display."""
+    return sorted(self.lookup(genre_ids).values())
+
+  def ids(self, names):
+    """Genre ids for ``names``; unknown names are skipped."""
+    self.refresh()
+    return [self.by_name[name] for name in names if name in self.by_name]
+
+genre_cache = GenreCache()
+
+class NameIndex:
+  """Sorted in-memory prefix index over venue or artist names.
+
+  Every word-start suffix of a casefolded name ("the blue room", "blue
+  room", "room") is kept as a ``(suffix, id)`` pair in one sorted list, so
+  a lookup is a bisect plus a short scan, matches from any word of the
+  name, and never touches the database once loaded.
+  """
+
+  def __init__(self, model, version_name):
+    self.model = model
+    self.version_name = version_name
+    self.keys = []
+    self.names = {}
+    self.version = None
+    self.lock = threading.Lock()
+
+  @staticmethod
+  def suffixes(name):
+    words = name.casefold().split()
+    return [' '.join(words[i:]) for i in range(len(words))]
+
+  def load(self):
+    # Read the version first: a write committed during the load moves it
+    # again, so the next refresh picks that write up.
+    version = current_cache_version(self.version_name)
+    names = dict(db.session.query(self.model.id, self.model.name).filter(self.model.name.isnot(None)))
+    keys = sorted((suffix, entity_id) for entity_id, name in names.items() for suffix in self.suffixes(name))
+    with self.lock:
+      self.keys, self.names, self.version = keys, names, version
+
+  def add(self, entity_id, name):
+    """Insert or rename one entry."""
+    with self.lock:
+      self._remove(entity_id)
+      self.names[entity_id] = name
+      for suffix in self.suffixes(name):
+        bisect.insort(self.keys, (suffix, entity_id))
+
+  def remove(self, entity_id):
+    with self.lock:
+      self._remove(entity_id)
+
+  def _remove(self, entity_id):
+    name = self.names.pop(entity_id, None)
+    if name is None:
+      return
+    for suffix in self.suffixes(name):
+      i = bisect.bisect_left(self.keys, (suffix, entity_id))
+      if i < len(self.keys) and self.keys[i] == (suffix, entity_id):
+        del self.keys[i]
+
+  def search(self, query, limit):
+    """Up to ``limit`` ``{"id", "name"}`` matches for a name prefix."""
+    query = ' '.join(query.casefold().split())
+    if not query:
+      return []
+
+    found = {}
+    with self.lock:
+      i = bisect.bisect_left(self.keys, (query,))
+      while i < len(self.keys) and len(found) < limit:
+        suffix, entity_id = self.keys[i]
+        if not suffix.startswith(query):
+          break
+        found.setdefault(entity_id, self.names[entity_id])
+        i += 1
+    return [{"id": entity_id, "name": name} for entity_id, name in found.items()]
+
+class Autocomplete:
+  """Name indexes behind /api/autocomplete.
+
+  wsgi.py loads them before gunicorn forks, so workers start with a copy.
+  The worker handling a create/edit/delete updates its own copy at once;
+  every other worker reloads an index from a background thread once its
+  ``cache_version`` row (NAME_VERSIONS) has moved, checked every
+  ``AUTOCOMPLETE_REFRESH_INTERVAL`` seconds (0 turns the thread off). Only
+  writes that add, rename or delete a venue or artist bump those rows, so
+  bookings and other edits do not trigger a reload. Bulk imports reach
+  every worker that way too.
+  """
+
+  def __init__(self, **indexes):
+    self.indexes = indexes
+    self.refresher_pid = None
+
+  def refresh(self):
+    """Reload the indexes whose table changed since they were loaded."""
+    for index in self.indexes.values():
+      if index.version is None or current_cache_version(index.version_name) != index.version:
+        index.load()
+
+  def start_refresher(self):
+    """Start the refresh thread once per process (again in each forked worker)."""
+    interval = app.config['AUTOCOMPLETE_REFRESH_INTERVAL']
+    if not interval or self.refresher_pid == os.getpid():
+      return
+    self.refresher_pid = os.getpid()
+
+    def run():
+      while True:
+        time.sleep(interval)
+        with app.app_context():
+          try:
+            self.refresh()
+          except Exception:
+            app.logger.exception('Refreshing the autocomplete indexes failed')
+          finally:
+            db.session.remove()
+
+    threading.Thread(target=run, name='autocomplete-refresher', daemon=True).start()
+
+  def search(self, kind, query, limit):
+    self.start_refresher()
+    index = self.indexes[kind]
+    if index.version is None:
+      # Not loaded before the fork (e.g. under `flask run`).
+      index.load()
+    return index.search(query, limit)
+
+  def add(self, kind, entity_id, name):
+    index = self.indexes[kind]
+    if index.version is not None:
+      index.add(entity_id, name)
+
+  def remove(self, kind, entity_id):
+    index = self.indexes[kind]
+    if index.version is not None:
+      index.remove(entity_id)
+
+NAME_VERSIONS = {'venues': 'venue_names', 'artists': 'artist_names'}
+
+autocomplete = Autocomplete(
+    venue=NameIndex(Venue, NAME_VERSIONS['venues']),
+    artist=NameIndex(Artist, NAME_VERSIONS['artists'])
+)
+
+def genre_ids_of(key_column, entity_id):
+  """Genre ids linked to one venue or artist, read from the join table only."""
+  table = key_column.table
+  return [row[0] for row in db.session.query(table.c.genre_id).filter(key_column == entity_id)]
+
+#----------------------------------------------------------------------------#
+# Helpers.
+#----------------------------------------------------------------------------#
+
+def column_data(instance):
+  """Plain column values of a model instance, e.g. to prefill a form."""
+  return {column.key: getattr(instance, column.key) for column in instance.__table__.columns}
+
+def resolve_genres(names):
+  """Return the Genre rows for ``names``, creating any that are missing.
+
+  Existing genres are fetched with one IN query. On Postgres the missing
+  ones are inserted in a single ``INSERT ... ON CONFLICT DO NOTHING``, so
+  concurrent posts cannot create duplicates, and then read back with one
+  more IN query, which also picks up names a concurrent insert won. Other
+  backends add the missing rows to the session.
+  """
+  names = list(dict.fromkeys(names))
+  if not names:
+    return []
+
+  genres = {genre.name: genre for genre in Genre.query.filter(Genre.name.in_(names))}
+  missing = [name for name in names if name not in genres]
+
+  if missing and db.engine.dialect.name == 'postgresql':
+    db.session.execute(
+        pg_insert(Genre.__table__).values(
+            [{"name": name} for name in missing]
+        ).on_conflict_do_nothing(
+            index_elements=['name']
+        )
+    )
+    # Rows inserted here and rows a concurrent post won alike.
+    genres.update((genre.name, genre) for genre in Genre.query.filter(Genre.name.in_(missing)))
+
+  elif missing:
+    for name in missing:
+      genres[name] = Genre(name=name)
+      db.session.add(genres[name])
+
+  if missing:
+    bump_cache_version('genres')
+    genre_cache.invalidate()
+
+  return [genres[name] for name in names]
+
+def show_counts(key_column, entity_id):
+  """(upcoming, past) show counts of one venue or artist in one query.
+
+  A show that starts now has started: it is past, as in the stored
+  counters (show_counter_values).
+  """
+  current_time = datetime.now()
+  return db.session.query(
+      db.func.count(Show.id).filter(Show.starting_time > current_time),
+      db.func.count(Show.id).filter(Show.starting_time <= current_time)
+  ).filter(key_column == entity_id).one()
+
+def encode_show_cursor(starting_time, show_id):
+  return f'{starting_time.isoformat()}_{show_id}'
+
+def decode_show_cursor(value):
+  starting_time, show_id = value.rsplit('_', 1)
+  return datetime.fromisoformat(starting_time), int(show_id)
+
+def show_timeline(key_column, entity_id, counterpart, counterpart_column, before=None):
+  """Upcoming and past shows of one venue or artist, split in SQL.
+
+  ``key_column`` selects the owner (``Show.venue_id`` / ``Show.artist_id``)
+  and ``counterpart`` is the model shown on each tile, joined through
+  ``counterpart_column``. Both counts come from one aggregate query; the
+  lists are limited to ``SHOWS_PER_PAGE`` rows. Past shows are paged
+  newest-first with ``before``, a ``(starting_time, id)`` keyset cursor as
+  on /shows so shows sharing a start time are not skipped between pages;
+  ``past_cursor`` is the encoded cursor of the next (older) page, or None
+  on the last one.
+  """
+  current_time = datetime.now()
+  per_page = app.config['SHOWS_PER_PAGE']
+
+  upcoming_count, past_count = show_counts(key_column, entity_id)
+
+  shows = db.session.query(
+      Show.id.label('show_id'),
+      Show.starting_time,
+      counterpart.id,
+      counterpart.name,
+      counterpart.image_link
+  ).join(
+      counterpart, counterpart_column == counterpart.id
+  ).filter(key_column == entity_id)
+
+  upcoming = shows.filter(
+      Show.starting_time > current_time
+  ).order_by(Show.starting_time).limit(per_page).all()
+
+  past = shows.filter(Show.starting_time <= current_time)
+  if before:
+    past = past.filter(db.tuple_(Show.starting_time, Show.id) < before)
+  past = past.order_by(Show.starting_time.desc(), Show.id.desc()).limit(per_page + 1).all()
+
+  past_cursor = None
+  if len(past) > per_page:
+    past = past[:per_page]
+    past_cursor = encode_show_cursor(past[-1].starting_time, past[-1].show_id)
+
+  return {
+      "upcoming": upcoming,
+      "upcoming_count": upcoming_count,
+      "past": past,
+      "past_count": past_count,
+      "past_cursor": past_cursor
+  }
+
+def name_match(column, search_term):
+  return column.ilike('%' + search_term + '%')
+
+def name_search(query, column, search_term):
+  """Filter ``query`` to rows whose ``column`` contains ``search_term``.
+
+  On Postgres the ILIKE is served by the pg_trgm GIN index and the matches
+  are ranked by trigram similarity to the term. Other backends (SQLite in
+  local runs) get the same filter ordered by name.
+  """
+  query = query.filter(name_match(column, search_term))
+
+  if search_term and db.engine.dialect.name == 'postgresql':
+    return query.order_by(db.func.similarity(column, search_term).desc(), column)
+  return query.order_by(column)
+
+#  Faceted search
+#  ----------------------------------------------------------------
+#
+#  /venues/search and /artists/search filter by name, state, city, genres
+#  and the seeking flag. Each facet group is counted with one GROUP BY
+#  query over the matches, never fetching them; a group's own filter is
+#  left out of its count, so the other values of a selected facet keep
+#  showing how many rows picking them instead would give.
+
+SEARCH_FIELDS = {
+    'venues': (Venue, venue_genre_table.c.venue_id, Venue.seeking_talent),
+    'artists': (Artist, artist_genre_table.c.artist_id, Artist.seeking_venue),
+}
+
+def search_filters(args):
+  """Facet filters from the query string or form; None means unfiltered."""
+  return {
+      "state": args.get('state') or None,
+      "city": args.get('city', '').strip() or None,
+      "genres": args.getlist('genres') or None,
+      "seeking": {'yes': True, 'no': False}.get(args.get('seeking')),
+  }
+
+def search_conditions(kind, search_term, filters, skip=None):
+  """WHERE clauses for a search, leaving out the ``skip`` group ('name'
+  or a facet group)."""
+  model, genre_key, seeking_column = SEARCH_FIELDS[kind]
+  conditions = []
+  if search_term and skip != 'name':
+    conditions.append(name_match(model.name, search_term))
+  if filters["state"] and skip != 'state':
+    conditions.append(model.state == filters["state"])
+  if filters["city"] and skip != 'city':
+    conditions.append(model.city == filters["city"])
+  if filters["genres"] and skip != 'genres':
+    genre_id = genre_key.table.c.genre_id
+    conditions.append(model.id.in_(
+        db.session.query(genre_key).filter(genre_id.in_(genre_cache.ids(filters["genres"])))
+    ))
+  if filters["seeking"] is not None and skip != 'seeking':
+    conditions.append(seeking_column.is_(filters["seeking"]))
+  return conditions
+
+def search_facets(kind, search_term, filters):
+  """Count the matches per facet value, one aggregate query per group.
+
+  Returns ``(total, facets)`` where ``facets`` maps each group to
+  ``[(value, label, count), ...]``, biggest first. The seeking group
+  splits every match by its flag, so its counts also give the total.
+  """
+  model, genre_key, seeking_column = SEARCH_FIELDS[kind]
+  limit = app.config['SEARCH_FACET_LIMIT']
+  count = db.func.count()
+  facets = {}
+
+  rows = db.session.query(model.state, count).filter(
+      *search_conditions(kind, search_term, filters, skip='state')
+  ).group_by(model.state).order_by(count.desc(), model.state).limit(limit)
+  facets["state"] = [(state, state, n) for state, n in rows if state]
+
+  rows = db.session.query(model.city, model.state, count).filter(
+      *search_conditions(kind, search_term, filters, skip='city')
+  ).group_by(model.city, model.state).order_by(count.desc(), model.city).limit(limit)
+  facets["city"] = [((city, state), f'{city}, {state}', n) for city, state, n in rows if city]
+
+  genre_id = genre_key.table.c.genre_id
+  rows = db.session.query(genre_id, count).join(model, model.id == genre_key).filter(
+      *search_conditions(kind, search_term, filters, skip='genres')
+  ).group_by(genre_id).order_by(count.desc(), genre_id).limit(limit).all()
+  names = genre_cache.lookup([gid for gid, n in rows])
+  facets["genres"] = [(names[gid], names[gid], n) for gid, n in rows if gid in names]
+
+  rows = db.session.query(seeking_column, count).filter(
+      *search_conditions(kind, search_term, filters, skip='seeking')
+  ).group_by(seeking_column).all()
+  facets["seeking"] = sorted(
+      (('yes' if seeking else 'no', 'Yes' if seeking else 'No', n) for seeking, n in rows if seeking is not None),
+      key=itemgetter(2), reverse=True
+  )
+  # Rows with no flag set count towards the total but match neither value.
+  total = sum(n for seeking, n in rows if filters["seeking"] in (None, seeking))
+  return total, facets
+
+def facet_links(endpoint, search_term, filters, facets):
+  """Facet values for display: ``{group: [{label, count, selected, url}]}``
+  where ``url`` repeats the search with that value toggled."""
+  args = {
+      "search_term": search_term,
+      "state": filters["state"],
+      "city": filters["city"],
+      "genres": filters["genres"],
+      "seeking": {True: 'yes', False: 'no'}.get(filters["seeking"]),
+  }
+
+  def entry(label, count, selected, **changes):
+    query = {key: value for key, value in dict(args, **changes).items() if value}
+    return {"label": label, "count": count, "selected": selected, "url": url_for(endpoint, **query)}
+
+  selected_genres = filters["genres"] or []
+  links = {group: [] for group in facets}
+  for value, label, count in facets["state"]:
+    selected = value == filters["state"]
+    links["state"].append(entry(label, count, selected, state=None if selected else value, city=None))
+  for (city, state), label, count in facets["city"]:
+    selected = city == filters["city"] and filters["state"] in (None, state)
+    changes = {"city": None} if selected else {"city": city, "state": state}
+    links["city"].append(entry(label, count, selected, **changes))
+  for value, label, count in facets["genres"]:
+    selected = value in selected_genres
+    genres = [name for name in selected_genres if name != value] if selected else selected_genres + [value]
+    links["genres"].append(entry(label, count, selected, genres=genres))
+  for value, label, count in facets["seeking"]:
+    selected = value == args["seeking"]
+    links["seeking"].append(entry(label, count, selected, seeking=None if selected else value))
+  return links
+
+def faceted_search(kind, search_term, filters):
+  """Results of a venue or artist search: the total count, the first
+  SEARCH_RESULTS_LIMIT matches and the facet counts."""
+  model, genre_key, seeking_column = SEARCH_FIELDS[kind]
+  total, facets = search_facets(kind, search_term, filters)
+  rows = name_search(
+      db.session.query(model.id, model.name, model.upcoming_shows_count), model.name, search_term
+  ).filter(
+      *search_conditions(kind, search_term, filters, skip='name')
+  ).limit(app.config['SEARCH_RESULTS_LIMIT']).all()
+
+  return {
+      "count": total,
+      "data": [
+          {"id": row.id, "name": row.name, "num_upcoming_shows": row.upcoming_shows_count}
+          for row in rows
+      ],
+      "facets": facets,
+  }
+
+#  Show counters
+#  ----------------------------------------------------------------
+#
+#  Venue and Artist carry upcoming_shows_count, past_shows_count and
+#  next_show_at so list and search pages read one column instead of
+#  counting shows. New shows update them in their own transaction
+#  (count_new_show); shows that start move from upcoming to past when
+#  `flask rollover-shows` runs, which only touches rows whose next_show_at
+#  has passed; `flask reconcile-show-counts` repairs any other drift.
+#
+#  Writers lock rows in one order to avoid deadlocks: Venue, then Artist
+#  (each in id order), then the area locks (refresh_areas), and
+#  cache_version last: bump_cache_version only marks a name, and the rows
+#  are updated at commit (bump_cache_versions).
+
+SHOW_COUNTER_MODELS = (
+    ('venues', Venue, Show.venue_id),
+    ('artists', Artist, Show.artist_id),
+)
+
+def show_counter_values(model, key_column, current_time):
+  """Correlated subqueries computing each counter column of ``model``."""
+  upcoming = db.and_(key_column == model.id, Show.starting_time > current_time)
+  return {
+      model.upcoming_shows_count: db.session.query(db.func.count(Show.id)).filter(upcoming).scalar_subquery(),
+      model.past_shows_count: db.session.query(db.func.count(Show.id)).filter(
+          key_column == model.id, Show.starting_time <= current_time
+      ).scalar_subquery(),
+      model.next_show_at: db.session.query(db.func.min(Show.starting_time)).filter(upcoming).scalar_subquery(),
+  }
+
+def refresh_show_counters(model, key_column, condition, current_time=None):
+  """Recompute the counters of the ``model`` rows matching ``condition`` in
+  one UPDATE within the current transaction; returns the number of rows."""
+  values = show_counter_values(model, key_column, current_time or datetime.now())
+  return model.query.filter(condition).update(values, synchronize_session=False)
+
+def count_new_show(venue_id, artist_id, starting_time):
+  """Add one show to its venue's and artist's counters, in the current transaction."""
+  upcoming = starting_time > datetime.now()
+  for model, entity_id in ((Venue, venue_id), (Artist, artist_id)):
+    if upcoming:
+      values = {
+          model.upcoming_shows_count: model.upcoming_shows_count + 1,
+          model.next_show_at: db.case(
+              (db.or_(model.next_show_at.is_(None), model.next_show_at > starting_time), starting_time),
+              else_=model.next_show_at
+          ),
+      }
+    else:
+      values = {model.past_shows_count: model.past_shows_count + 1}
+    model.query.filter(model.id == entity_id).update(values, synchronize_session=False)
+
+def rollover_show_counters():
+  """Move started shows from upcoming to past; returns rows updated per kind."""
+  current_time = datetime.now()
+  areas = set()
+  updated = {}
+  for kind, model, key_column in SHOW_COUNTER_MODELS:
+    # Lock in id order, venues before artists, as known_show_parties does for
+    # new shows; then the area locks, and the cache_version rows last.
+    ids = [row[0] for row in db.session.query(model.id).filter(
+        model.next_show_at <= current_time
+    ).order_by(model.id).with_for_update()]
+    for batch in bulk.batched(ids, 1000):
+      refresh_show_counters(model, key_column, model.id.in_(batch), current_time)
+      if model is Venue:
+        areas.update(venue_areas(Venue.id.in_(batch)))
+    updated[kind] = len(ids)
+  area_tags = refresh_areas(areas)
+  for kind, count in updated.items():
+    if count:
+      bump_cache_version(kind)
+  db.session.commit()
+
+  # /venues and the area pages are the only cached pages rendering a counter.
+  if updated['venues']:
+    page_cache.invalidate('venues', *area_tags)
+  return updated
+
+def show_counter_drift(model, key_column, current_time):
+  """Rows whose stored counters differ from the Show table:
+  ``(id, stored (upcoming, past, next), expected (upcoming, past, next))``."""
+  values = show_counter_values(model, key_column, current_time)
+  columns = list(values)
+  rows = db.session.query(
+      model.id, *columns, *values.values()
+  ).filter(
+      db.or_(*(column.is_distinct_from(expected) for column, expected in values.items()))
+  ).order_by(model.id)
+  return [(row[0], tuple(row[1:4]), tuple(row[4:7])) for row in rows]
+
+#  Area summary
+#  ----------------------------------------------------------------
+#
+#  area_summary is a summary table rather than a Postgres materialized
+#  view: a view can only be refreshed as a whole, while writers here
+#  rebuild just the areas they touched, in their own transaction. Every
+#  change to a venue's area, name or upcoming_shows_count must go through
+#  refresh_areas(); `flask refresh-areas` rebuilds them all.
+
+AREA_BATCH_SIZE = 200
+
+def area_tag(state, city):
+  return f'area:{state}:{city}'
+
+def venue_areas(condition):
+  """Distinct (state, city) pairs of the venues matching ``condition``."""
+  return [tuple(row) for row in db.session.query(Venue.state, Venue.city).filter(condition).distinct()]
+
+def refresh_areas(areas):
+  """Rebuild the area_summary rows of ``areas`` ((state, city) pairs) from
+  Venue within the current transaction; returns their page-cache tags.
+
+  On Postgres every area is locked first with a transaction-level
+  advisory lock on its tag, taken in one statement in hash order. That
+  covers areas that have no row yet, which FOR UPDATE could not lock, so
+  concurrent writers to one area rebuild it one after the other and the
+  later one reads the earlier one's venues. Areas left without venues are
+  deleted.
+  """
+  areas = sorted({tuple(area) for area in areas if None not in area})
+
+  if areas and db.engine.dialect.name == 'postgresql':
+    # Volatile select-list functions run after the ORDER BY sort.
+    db.session.execute(
+        db.text('SELECT pg_advisory_xact_lock(hashtext(tag)) FROM unnest(CAST(:tags AS text[])) AS tag '
+                'ORDER BY hashtext(tag)'),
+        {"tags": [area_tag(state, city) for state, city in areas]}
+    )
+
+  for batch in bulk.batched(areas, AREA_BATCH_SIZE):
+    def in_batch(model):
+      return db.or_(*(db.and_(model.state == state, model.city == city) for state, city in batch))
+
+    summaries = {
+        (state, city): {"state": state, "city": city, "venues_count": 0, "upcoming_shows_count": 0, "venues": []}
+        for state, city in batch
+    }
+    rows = db.session.query(
+        Venue.state, Venue.city, Venue.id, Venue.name, Venue.upcoming_shows_count
+    ).filter(in_batch(Venue)).order_by(Venue.id)
+    for state, city, venue_id, name, upcoming_count in rows:
+      summary = summaries[(state, city)]
+      summary["venues"].append([venue_id, name, upcoming_count])
+      summary["venues_count"] += 1
+      summary["upcoming_shows_count"] += upcoming_count
+
+    present = [summary for summary in summaries.values() if summary["venues"]]
+    if db.engine.dialect.name == 'postgresql':
+      empty = [area for area, summary in summaries.items() if not summary["venues"]]
+      if present:
+        statement = pg_insert(AreaSummary.__table__).values(present)
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=['state', 'city'],
+            set_={column: statement.excluded[column] for column in ('venues_count', 'upcoming_shows_count', 'venues')}
+        ))
+      if empty:
+        AreaSummary.query.filter(
+            db.or_(*(db.and_(AreaSummary.state == state, AreaSummary.city == city) for state, city in empty))
+        ).delete(synchronize_session=False)
+    else:
+      AreaSummary.query.filter(in_batch(AreaSummary)).delete(synchronize_session=False)
+      if present:
+        db.session.execute(AreaSummary.__table__.insert(), present)
+
+  return [area_tag(state, city) for state, city in areas]
+
+#  Show scheduling
+#  ----------------------------------------------------------------
+#
+#  Shared by the show import, the scheduling API and the new-show form.
+#  A show is taken to last SHOW_DURATION_MINUTES, so two shows of one
+#  venue or artist are a double booking when they start less than that
+#  apart.
+
+SHOW_CONFLICT_BATCH_SIZE = 200
+
+def parse_show_rows(rows, rejects):
+  """Parse ``(line_number, row)`` pairs into Show values.
+
+  Venue and artist ids are checked with one IN query per table. Returns
+  ``[(line_number, row, values)]`` for the good rows; the rest go to
+  ``rejects``.
+  """
+  parsed = []
+  for line_number, row in rows:
+    if isinstance(row, Exception):
+      rejects.write(line_number, None, {'row': [str(row)]})
+      continue
+    if not isinstance(row, dict):
+      rejects.write(line_number, None, {'row': ['Expected an object.']})
+      continue
+    errors = {}
+    values = {}
+    for field in ('artist_id', 'venue_id'):
+      try:
+        values[field] = int(str(row.get(field) or '').strip())
+      except ValueError:
+        errors[field] = ['Not a valid integer value.']
+    try:
+      values['starting_time'] = datetime.fromisoformat(str(row.get('starting_time') or '').strip())
+    except ValueError:
+      errors['starting_time'] = ['Not a valid datetime value.']
+    else:
+      # starting_time is stored naive, in server time, like the form's.
+      if values['starting_time'].tzinfo is not None:
+        errors['starting_time'] = ['Give the time without a UTC offset.']
+    if errors:
+      rejects.write(line_number, row, errors)
+    else:
+      parsed.append((line_number, row, values))
+
+  # One IN query per referenced table instead of an FK error per bad row.
+  known = known_show_parties(
+      {values['venue_id'] for _, _, values in parsed},
+      {values['artist_id'] for _, _, values in parsed}
+  )
+
+  valid = []
+  for line_number, row, values in parsed:
+    errors = {}
+    if values['venue_id'] not in known['venue_id']:
+      errors['venue_id'] = ['Unknown venue.']
+    if values['artist_id'] not in known['artist_id']:
+      errors['artist_id'] = ['Unknown artist.']
+    if errors:
+      rejects.write(line_number, row, errors)
+    else:
+      valid.append((line_number, row, values))
+  return valid
+
+def known_show_parties(venue_ids, artist_ids):
+  """``{'venue_id': ids, 'artist_id': ids}`` of the rows that exist, one IN
+  query per table.
+
+  The rows are locked (FOR UPDATE, on Postgres) until the transaction
+  ends, so concurrent bookings of one venue or artist check for conflicts
+  one after the other.
+  """
+  known = {}
+  for field, model, ids in (('venue_id', Venue, venue_ids), ('artist_id', Artist, artist_ids)):
+    rows = db.session.query(model.id).filter(model.id.in_(ids)).order_by(model.id).with_for_update() if ids else []
+    known[field] = {row[0] for row in rows}
+  return known
+
+def show_conflicts(rows):
+  """Double bookings among ``rows`` (dicts with venue_id, artist_id and
+  starting_time): ``{index: errors}`` for every row overlapping a booked
+  show of its venue or artist, or an earlier row of ``rows``.
+
+  Booked shows come from one query per table and SHOW_CONFLICT_BATCH_SIZE
+  rows: an OR of starting_time windows, each a range scan of the
+  (venue_id, starting_time) or (artist_id, starting_time) index.
+  """
+  duration = timedelta(minutes=app.config['SHOW_DURATION_MINUTES'])
+  booked = {}
+  for field, key_column in (('venue_id', Show.venue_id), ('artist_id', Show.artist_id)):
+    booked[field] = {}
+    for batch in bulk.batched(rows, SHOW_CONFLICT_BATCH_SIZE):
+      windows = db.or_(*(
+          db.and_(key_column == values[field],
+                  Show.starting_time > values['starting_time'] - duration,
+                  Show.starting_time < values['starting_time'] + duration)
+          for values in batch
+      ))
+      for entity_id, starting_time in db.session.query(key_column, Show.starting_time).filter(windows):
+        booked[field].setdefault(entity_id, []).append(starting_time)
+    for times in booked[field].values():
+      times.sort()
+
+  conflicts = {}
+  for index, values in enumerate(rows):
+    start = values['starting_time']
+    errors = {}
+    for field, label in (('venue_id', 'venue'), ('artist_id', 'artist')):
+      times = booked[field].get(values[field], [])
+      i = bisect.bisect_right(times, start - duration)
+      if i < len(times) and times[i] < start + duration:
+        errors[field] = [f'The {label} already has a show at {times[i].isoformat(" ")}.']
+    if errors:
+      conflicts[index] = errors
+      continue
+    # Later rows must not overlap this one either.
+    for field in ('venue_id', 'artist_id'):
+      bisect.insort(booked[field].setdefault(values[field], []), start)
+  return conflicts
+
+def insert_shows(rows):
+  """Insert Show rows with their counter, area and cache-version updates
+  in the current transaction; returns the page-cache tags to invalidate
+  once it commits."""
+  db.session.execute(Show.__table__.insert(), rows)
+  show_venues = Venue.id.in_({values['venue_id'] for values in rows})
+  refresh_show_counters(Venue, Show.venue_id, show_venues)
+  refresh_show_counters(Artist, Show.artist_id, Artist.id.in_({values['artist_id'] for values in rows}))
+  area_tags = refresh_areas(venue_areas(show_venues))
+  bump_cache_version('shows')
+  bump_cache_version('venues')
+  bump_cache_version('artists')
+  return [
+      'shows', 'venues', *area_tags,
+      *(f'venue:{values["venue_id"]}' for values in rows),
+      *(f'artist:{values["artist_id"]}' for values in rows)
+  ]
+
+def schedule_shows(rows, rejects):
+  """Book ``(line_number, row)`` shows in one transaction: every row that
+  parses, names a known venue and artist and is not a double booking is
+  inserted, the rest go to ``rejects``. Returns the number inserted."""
+  parsed = parse_show_rows(rows, rejects)
+  conflicts = show_conflicts([values for _, _, values in parsed])
+
+  valid = []
+  for index, (line_number, row, values) in enumerate(parsed):
+    if index in conflicts:
+      rejects.write(line_number, row, conflicts[index])
+    else:
+      valid.append(values)
+  if not valid:
+    db.session.rollback()
+    return 0
+
+  tags = insert_shows(valid)
+  db.session.commit()
+  page_cache.invalidate(*tags)
+  return len(valid)
+
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
@@ -133,102 +1081,86 @@ def index():
 #  ----------------------------------------------------------------
 
 @app.route('/venues')
+@page_cache.cached()
 def venues():
-  venues = Venue.query.all()
-
+  # One row per area from area_summary, already holding its venues and
+  # their upcoming_shows_count; the Venue table is not read.
   data = []
-  cities_states = set()
-
-  for venue in venues:
-    cities_states.add((venue.city, venue.state))
+  for area in AreaSummary.query.order_by(AreaSummary.state, AreaSummary.city):
+    data.append({
+        "city": area.city,
+        "state": area.state,
+        "venues": [
+            {"id": venue_id, "name": name, "num_upcoming_shows": upcoming_count}
+            for venue_id, name, upcoming_count in area.venues
+        ]
+    })
 
-  cities_states = list(cities_states)
-  cities_states.sort(key=itemgetter(1,0))
+  page_cache.tag('venues')
+  return render_template('pages/venues.html', areas=data);
 
-  current_time = datetime.now()
-  
-  for loc in cities_states:
-    venues_list = []
-    for venue in venues:
-      if (venue.city == loc[0]) and (venue.state == loc[1]):
-        venue_shows = Show.query.filter_by(venue_id=venue.id).all()
-        upcoming_count = 0
-        for show in venue_shows:
-          if show.starting_time > current_time:
-            upcoming_count += 1
-
-        venues_list.append({
-          "id": venue.id,
-          "name": venue.name,
-          "num_upcoming_shows": upcoming_count
-        }) 
+@app.route('/areas/<state>/<path:city>')
+@page_cache.cached()
+def show_area(state, city):
+  # A single summary row, however many venues the city has.
+  area = AreaSummary.query.get((state, city))
+  if not area:
+    return redirect(url_for('venues'))
 
-    data.append({
-            "city": loc[0],
-            "state": loc[1],
-            "venues": venues_list
-        })
+  data = {
+      "city": area.city,
+      "state": area.state,
+      "num_venues": area.venues_count,
+      "num_upcoming_shows": area.upcoming_shows_count,
+      "venues": [
+          {"id": venue_id, "name": name, "num_upcoming_shows": upcoming_count}
+          for venue_id, name, upcoming_count in area.venues
+      ]
+  }
 
-  return render_template('pages/venues.html', areas=data);
+  page_cache.tag(area_tag(state, city))
+  return render_template('pages/show_area.html', area=data)
 
-@app.route('/venues/search', methods=['POST'])
+@app.route('/venues/search', methods=['GET', 'POST'])
 def search_venues():
-  search_term = request.form.get('search_term', '').strip()
+  # POSTed by the header search box; facet links repeat it as a GET.
+  search_term = request.values.get('search_term', '').strip()
+  filters = search_filters(request.values)
 
-  venues = Venue.query.filter(Venue.name.ilike('%' + search_term + '%')).all()
-  venue_list = []
-  current_time = datetime.now()
-  for venue in venues:
-    venue_shows = Show.query.filter_by(venue_id=venue.id).all()
-    upcoming_count = 0
-    for show in venue_shows:
-        if show.starting_time > current_time:
-            upcoming_count += 1
-
-    venue_list.append({
-        "id": venue.id,
-        "name": venue.name,
-        "num_upcoming_shows": upcoming_count  
-    })
-
-  response = {
-    "count": len(venues),
-    "data": venue_list
-  }
+  response = faceted_search('venues', search_term, filters)
+  response["facets"] = facet_links('search_venues', search_term, filters, response["facets"])
 
   return render_template('pages/search_venues.html', results=response, search_term=search_term)
 
 @app.route('/venues/<int:venue_id>')
+@page_cache.cached()
 def show_venue(venue_id):
   venue = Venue.query.get(venue_id)
   
   if not venue:
     return redirect(url_for('index'))
   else:
-    genres = [genre.name for genre in venue.genres]
-    previous_shows = []
-    previous_shows_count = 0
+    genres = genre_cache.names(genre_ids_of(venue_genre_table.c.venue_id, venue_id))
+    timeline = show_timeline(Show.venue_id, venue_id, Artist, Show.artist_id,
+                             before=request.args.get('before', type=decode_show_cursor))
+
     upcoming_shows = []
-    upcoming_shows_count = 0
-    current_time = datetime.now()
-    
-    for show in venue.shows:
-      if show.starting_time > current_time:
-          upcoming_shows_count += 1
-          upcoming_shows.append({
-              "artist_id": show.artist_id,
-              "artist_name": show.artist.name,
-              "artist_image_link": show.artist.image_link,
-              "starting_time": format_datetime(str(show.starting_time))
-          })
-      if show.starting_time < current_time:
-          previous_shows_count += 1
-          previous_shows.append({
-              "artist_id": show.artist_id,
-              "artist_name": show.artist.name,
-              "artist_image_link": show.artist.image_link,
-              "starting_time": format_datetime(str(show.starting_time))
-          })
+    for show in timeline["upcoming"]:
+      upcoming_shows.append({
+          "artist_id": show.id,
+          "artist_name": show.name,
+          "artist_image_link": show.image_link,
+          "starting_time": show.starting_time
+      })
+
+    previous_shows = []
+    for show in timeline["past"]:
+      previous_shows.append({
+          "artist_id": show.id,
+          "artist_name": show.name,
+          "artist_image_link": show.image_link,
+          "starting_time": show.starting_time
+      })
   
   
   data = {
@@ -245,11 +1177,14 @@ def show_venue(venue_id):
           "seeking_description": venue.seeking_description,
           "image_link": venue.image_link,
           "previous_shows": previous_shows,
-          "previous_shows_count": previous_shows_count,
+          "previous_shows_count": timeline["past_count"],
+          "previous_shows_cursor": timeline["past_cursor"],
           "upcoming_shows": upcoming_shows,
-          "upcoming_shows_count": upcoming_shows_count
+          "upcoming_shows_count": timeline["upcoming_count"]
         }
   
+  page_cache.tag(f'venue:{venue_id}')
+  page_cache.tag(*(f'artist:{show["artist_id"]}' for show in upcoming_shows + previous_shows))
   return render_template('pages/show_venue.html', venue=data)
 
 #  Create Venue
@@ -283,38 +1218,36 @@ def create_venue_submission():
 
   else:
       insertion_error = False
+      area_tags = []
       try:
           new_venue = Venue(name=name, city=city, state=state, address=address, phone=phone, \
               seeking_talent=seeking_talent, seeking_description=seeking_description, image_link=image_link, \
               website_link=website_link, facebook_link=facebook_link)
-        
-          for genre in genres:
-            get_genre = Genre.query.filter_by(name=genre).one_or_none()
-            if get_genre:
-              new_venue.genres.append(get_genre)
-
-            else:
-              new_genre = Genre(name=genre)
-              db.session.add(new_genre)
-              new_venue.genres.append(new_genre)  
+          new_venue.genres = resolve_genres(genres)
 
           db.session.add(new_venue)
+          area_tags = refresh_areas([(state, city)])
+          bump_cache_version('venues')
+          bump_cache_version('venue_names')
+          db.session.flush()
+          new_venue_id = new_venue.id
           db.session.commit()
           
-      except Exception as e:
+      except Exception:
           insertion_error = True
-          print(f'Exception "{e}" happened while creating venue submission!')
+          app.logger.exception('Creating venue %r failed', name)
           db.session.rollback()
           
       finally:
           db.session.close()
 
       if not insertion_error:
+          page_cache.invalidate('venues', *area_tags)
+          autocomplete.add('venue', new_venue_id, name)
           flash('Venue ' + request.form['name'] + ' successfully created!')
           return redirect(url_for('index'))
       else:
           flash('ERROR!!!. Venue ' + name + ' could not be created!.')
-          print("Error happened while creating venue submission")
           abort(500)
 
 @app.route('/venues/<venue_id>', methods=['DELETE'])
@@ -326,21 +1259,28 @@ def delete_venue(venue_id):
   else:
       deletion_error = False
       venue_name = venue.name
+      area_tags = []
       
       try:
+          area = (venue.state, venue.city)
           db.session.delete(venue)
+          area_tags = refresh_areas([area])
+          bump_cache_version('venues')
+          bump_cache_version('venue_names')
           db.session.commit()
-      except:
+      except Exception:
           deletion_error = True
+          app.logger.exception('Deleting venue %s failed', venue_id)
           db.session.rollback()
       finally:
           db.session.close()
           
       if deletion_error:
           flash(f'An error happened while deleting {venue_name}.')
-          print("Error happened while deleting venue")
           abort(500)
       else:
+          page_cache.invalidate('venues', f'venue:{venue_id}', *area_tags)
+          autocomplete.remove('venue', int(venue_id))
           return jsonify({
               'deleted': True,
               'url': url_for('venues')
@@ -351,6 +1291,7 @@ def delete_venue(venue_id):
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
+@page_cache.cached()
 def artists():
   artists = Artist.query.order_by(Artist.name).all()  
 
@@ -361,65 +1302,47 @@ def artists():
           "name": artist.name
       })
       
+  page_cache.tag('artists')
   return render_template('pages/artists.html', artists=results)
 
-@app.route('/artists/search', methods=['POST'])
+@app.route('/artists/search', methods=['GET', 'POST'])
 def search_artists():
-  search_term = request.form.get('search_term', '').strip()
-  artists = Artist.query.filter(Artist.name.ilike('%' + search_term + '%')).all()  
-  artist_list = []
-  current_time = datetime.now()
-  
-  for artist in artists:
-      artist_shows = Show.query.filter_by(artist_id=artist.id).all()
-      upcoming_count = 0
-      
-      for show in artist_shows:
-          if show.starting_time > current_time:
-              upcoming_count += 1
+  search_term = request.values.get('search_term', '').strip()
+  filters = search_filters(request.values)
 
-      artist_list.append({
-          "id": artist.id,
-          "name": artist.name,
-          "num_upcoming_shows": upcoming_count  
-      })
+  response = faceted_search('artists', search_term, filters)
+  response["facets"] = facet_links('search_artists', search_term, filters, response["facets"])
 
-  response = {
-      "count": len(artists),
-      "data": artist_list
-  }
-  return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+  return render_template('pages/search_artists.html', results=response, search_term=search_term)
 
 @app.route('/artists/<int:artist_id>')
+@page_cache.cached()
 def show_artist(artist_id):
-  artist = Artist.query.get(artist_id)   
+  artist = Artist.query.get(artist_id)
   if not artist:
       return redirect(url_for('index'))
   else:
-      genres = [ genre.name for genre in artist.genres ]
-      previous_shows = []
-      previous_shows_count = 0
+      genres = genre_cache.names(genre_ids_of(artist_genre_table.c.artist_id, artist_id))
+      timeline = show_timeline(Show.artist_id, artist_id, Venue, Show.venue_id,
+                               before=request.args.get('before', type=decode_show_cursor))
+
       upcoming_shows = []
-      upcoming_shows_count = 0
-      current_time = datetime.now()
-      
-      for show in artist.shows:
-          if show.starting_time > current_time:
-              upcoming_shows_count += 1
-              upcoming_shows.append({
-                  "venue_id": show.venue_id,
-                  "venue_name": show.venue.name,
-                  "venue_image_link": show.venue.image_link,
-                  "starting_time": format_datetime(str(show.starting_time))
-              })
-          if show.starting_time < current_time:
-              previous_shows_count += 1
-              previous_shows.append({
-                  "venue_id": show.venue_id,
-                  "venue_name": show.venue.name,
-                  "venue_image_link": show.venue.image_link,
-                  "starting_time": format_datetime(str(show.starting_time))
-              })
+      for show in timeline["upcoming"]:
+          upcoming_shows.append({
+              "venue_id": show.id,
+              "venue_name": show.name,
+              "venue_image_link": show.image_link,
+              "starting_time": show.starting_time
+          })
+
+      previous_shows = []
+      for show in timeline["past"]:
+          previous_shows.append({
+              "venue_id": show.id,
+              "venue_name": show.name,
+              "venue_image_link": show.image_link,
+              "starting_time": show.starting_time
+          })
 
       data = {
           "id": artist_id,
@@ -434,11 +1357,14 @@ def show_artist(artist_id):
           "seeking_description": artist.seeking_description,
           "image_link": artist.image_link,
           "past_shows": previous_shows,
-          "past_shows_count": previous_shows_count,
+          "past_shows_count": timeline["past_count"],
+          "past_shows_cursor": timeline["past_cursor"],
           "upcoming_shows": upcoming_shows,
-          "upcoming_shows_count": upcoming_shows_count
+          "upcoming_shows_count": timeline["upcoming_count"]
       }
       
+  page_cache.tag(f'artist:{artist_id}')
+  page_cache.tag(*(f'venue:{show["venue_id"]}' for show in upcoming_shows + previous_shows))
   return render_template('pages/show_artist.html', artist=data)
 
 #  Update
@@ -449,9 +1375,9 @@ def edit_artist(artist_id):
   if not artist:
       return redirect(url_for('index'))
   else:
-      form = ArtistForm(obj=artist)
+      genres = genre_cache.names(genre_ids_of(artist_genre_table.c.artist_id, artist_id))
+      form = ArtistForm(data=dict(column_data(artist), genres=genres))
 
-  genres = [ genre.name for genre in artist.genres ]
   artist={
     "id": artist_id,
     "name": artist.name,
@@ -493,6 +1419,7 @@ def edit_artist_submission(artist_id):
       update_error = False
       try:
           artist = Artist.query.get(artist_id)
+          renamed = artist.name != name
           artist.name = name
           artist.city = city
           artist.state = state
@@ -502,32 +1429,26 @@ def edit_artist_submission(artist_id):
           artist.image_link = image_link
           artist.website_link = website_link
           artist.facebook_link = facebook_link
-          artist.genres = []
-          
-          for genre in genres:
-              fetch_genre = Genre.query.filter_by(name=genre).one_or_none() 
-              if fetch_genre:
-                  artist.genres.append(fetch_genre)
-
-              else:
-                  new_genre = Genre(name=genre)
-                  db.session.add(new_genre)
-                  artist.genres.append(new_genre) 
+          artist.genres = resolve_genres(genres)
+          bump_cache_version('artists')
+          if renamed:
+            bump_cache_version('artist_names')
 
           db.session.commit()
-      except Exception as e:
+      except Exception:
           update_error = True
-          print(f'Exception "{e}" in editing artist info')
+          app.logger.exception('Updating artist %s failed', artist_id)
           db.session.rollback()
       finally:
           db.session.close()
 
       if not update_error:
+          page_cache.invalidate('artists', f'artist:{artist_id}')
+          autocomplete.add('artist', artist_id, name)
           flash('Artist ' + request.form['name'] + ' successfully updated!')
           return redirect(url_for('show_artist', artist_id=artist_id))
       else:
           flash('An error occurred. Artist ' + name + ' could not be updated.')
-          print("Error while updating artist")
           abort(500)
 
 @app.route('/venues/<int:venue_id>/edit', methods=['GET'])
@@ -536,9 +1457,9 @@ def edit_venue(venue_id):
   if not venue:
       return redirect(url_for('index'))
   else:
-      form = VenueForm(obj=venue)
+      genres = genre_cache.names(genre_ids_of(venue_genre_table.c.venue_id, venue_id))
+      form = VenueForm(data=dict(column_data(venue), genres=genres))
 
-  genres = [ genre.name for genre in venue.genres ]
     
   venue={
     "id": venue_id,
@@ -580,8 +1501,11 @@ def edit_venue_submission(venue_id):
 
   else:
       update_error = False
+      area_tags = []
       try:
           venue = Venue.query.get(venue_id)
+          old_area = (venue.state, venue.city)
+          renamed = venue.name != name
           venue.name = name
           venue.city = city
           venue.state = state
@@ -592,32 +1516,27 @@ def edit_venue_submission(venue_id):
           venue.image_link = image_link
           venue.website_link = website_link
           venue.facebook_link = facebook_link
-          venue.genres = []
-            
-          for genre in genres:
-              fetch_genre = Genre.query.filter_by(name=genre).one_or_none() 
-              if fetch_genre:
-                  venue.genres.append(fetch_genre)
-              else:
-                  new_genre = Genre(name=genre)
-                  db.session.add(new_genre)
-                  venue.genres.append(new_genre)  
-
+          venue.genres = resolve_genres(genres)
+          area_tags = refresh_areas([old_area, (state, city)])
+          bump_cache_version('venues')
+          if renamed:
+            bump_cache_version('venue_names')
 
           db.session.commit()
-      except Exception as e:
+      except Exception:
           update_error = True
-          print(f'Exception "{e}" while editing venue')
+          app.logger.exception('Updating venue %s failed', venue_id)
           db.session.rollback()
       finally:
           db.session.close()
 
       if not update_error:
+          page_cache.invalidate('venues', f'venue:{venue_id}', *area_tags)
+          autocomplete.add('venue', venue_id, name)
           flash('Venue ' + request.form['name'] + ' successfully updated!')
           return redirect(url_for('show_venue', venue_id=venue_id))
       else:
           flash('An error happened. Venue ' + name + ' could not be updated.')
-          print("Error while editing the venuw")
           abort(500)
 
 
@@ -654,29 +1573,27 @@ def create_artist_submission():
           new_artist = Artist(name=name, city=city, state=state, phone=phone, \
               seeking_venue=seeking_venue, seeking_description=seeking_description, image_link=image_link, \
               website_link=website_link, facebook_link=facebook_link)
-          for genre in genres:
-              fetch_genre = Genre.query.filter_by(name=genre).one_or_none() 
-              if fetch_genre:
-                  new_artist.genres.append(fetch_genre)
-              else:
-                  new_genre = Genre(name=genre)
-                  db.session.add(new_genre)
-                  new_artist.genres.append(new_genre)  
+          new_artist.genres = resolve_genres(genres)
           db.session.add(new_artist)
+          bump_cache_version('artists')
+          bump_cache_version('artist_names')
+          db.session.flush()
+          new_artist_id = new_artist.id
           db.session.commit()
-      except Exception as e:
+      except Exception:
           insertion_error = True
-          print(f'Exception "{e}" in create_artist_submission()')
+          app.logger.exception('Creating artist %r failed', name)
           db.session.rollback()
       finally:
           db.session.close()
 
       if not insertion_error:
+          page_cache.invalidate('artists')
+          autocomplete.add('artist', new_artist_id, name)
           flash('Artist ' + request.form['name'] + ' was successfully listed!')
           return redirect(url_for('index'))
       else:
           flash('An error occurred. Artist ' + name + ' could not be listed.')
-          print("Error in create_artist_submission()")
           abort(500)
           
 
@@ -686,21 +1603,82 @@ def create_artist_submission():
 #  ----------------------------------------------------------------
 
 @app.route('/shows')
+@page_cache.cached()
 def shows():
+  per_page = app.config['SHOWS_LISTING_PER_PAGE']
+  after = request.args.get('after', type=decode_show_cursor)
+  before = request.args.get('before', type=decode_show_cursor)
+
+  filters = {}
+  for name, convert in (('from', datetime.fromisoformat), ('to', datetime.fromisoformat),
+                        ('venue_id', int), ('artist_id', int), ('city', str)):
+    value = request.args.get(name, type=convert)
+    if value is not None and value != '':
+      filters[name] = value
+
+  query = db.session.query(
+      Show.id,
+      Show.starting_time,
+      Venue.id.label('venue_id'),
+      Venue.name.label('venue_name'),
+      Artist.id.label('artist_id'),
+      Artist.name.label('artist_name'),
+      Artist.image_link.label('artist_image_link')
+  ).join(
+      Venue, Show.venue_id == Venue.id
+  ).join(
+      Artist, Show.artist_id == Artist.id
+  )
+
+  if 'from' in filters:
+    query = query.filter(Show.starting_time >= filters['from'])
+  if 'to' in filters:
+    query = query.filter(Show.starting_time < filters['to'])
+  if 'venue_id' in filters:
+    query = query.filter(Show.venue_id == filters['venue_id'])
+  if 'artist_id' in filters:
+    query = query.filter(Show.artist_id == filters['artist_id'])
+  if 'city' in filters:
+    query = query.filter(Venue.city == filters['city'])
+
+  # Keyset pagination on (starting_time, id): fetch one extra row to know
+  # whether another page exists in the direction we are walking.
+  sort_key = db.tuple_(Show.starting_time, Show.id)
+  if before:
+    rows = query.filter(sort_key < before).order_by(
+        Show.starting_time.desc(), Show.id.desc()
+    ).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page][::-1]
+    prev_cursor = encode_show_cursor(rows[0].starting_time, rows[0].id) if has_more else None
+    next_cursor = encode_show_cursor(rows[-1].starting_time, rows[-1].id) if rows else None
+  else:
+    if after:
+      query = query.filter(sort_key > after)
+    rows = query.order_by(
+        Show.starting_time, Show.id
+    ).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    prev_cursor = encode_show_cursor(rows[0].starting_time, rows[0].id) if after and rows else None
+    next_cursor = encode_show_cursor(rows[-1].starting_time, rows[-1].id) if has_more else None
+
   data = []
-  shows = Show.query.all()
-  
-  for show in shows:
+  for show in rows:
       data.append({
-          "venue_id": show.venue.id,
-          "venue_name": show.venue.name,
-          "artist_id": show.artist.id,
-          "artist_name": show.artist.name,
-          "artist_image_link": show.artist.image_link,
-          "starting_time": format_datetime(str(show.starting_time))
+          "venue_id": show.venue_id,
+          "venue_name": show.venue_name,
+          "artist_id": show.artist_id,
+          "artist_name": show.artist_name,
+          "artist_image_link": show.artist_image_link,
+          "starting_time": show.starting_time
       })
 
-  return render_template('pages/shows.html', shows=data)
+  page_cache.tag('shows')
+  page_cache.tag(*(f'venue:{show["venue_id"]}' for show in data))
+  page_cache.tag(*(f'artist:{show["artist_id"]}' for show in data))
+  return render_template('pages/shows.html', shows=data, filters=filters,
+                         prev_cursor=prev_cursor, next_cursor=next_cursor)
 
 @app.route('/shows/create')
 def create_shows():
@@ -715,27 +1693,441 @@ def create_show_submission():
   starting_time = form.starting_time.data
 
   error_in_insert = False
+  rejected = None
+  area_tags = []
   
   try:
-      new_show = Show(starting_time=starting_time, artist_id=artist_id, venue_id=venue_id)
-      db.session.add(new_show)
-      db.session.commit()
-  except Exception as e:
+      values = {"venue_id": int(venue_id), "artist_id": int(artist_id), "starting_time": starting_time}
+      known = known_show_parties({values["venue_id"]}, {values["artist_id"]})
+      if values["venue_id"] not in known['venue_id'] or values["artist_id"] not in known['artist_id']:
+        rejected = 'unknown venue or artist.'
+      else:
+        conflicts = show_conflicts([values])
+        if conflicts:
+          rejected = ' '.join(message for messages in conflicts[0].values() for message in messages)
+
+      if rejected:
+        db.session.rollback()
+      else:
+        new_show = Show(starting_time=starting_time, artist_id=artist_id, venue_id=venue_id)
+        db.session.add(new_show)
+        count_new_show(venue_id, artist_id, starting_time)
+        if starting_time > datetime.now():
+          area_tags = refresh_areas(venue_areas(Venue.id == venue_id))
+        bump_cache_version('shows')
+        bump_cache_version('venues')
+        bump_cache_version('artists')
+        db.session.commit()
+  except Exception:
       error_in_insert = True
-      print(f'Exception "{e}" in create_show_submission()')
+      app.logger.exception('Creating show (artist %s, venue %s) failed', artist_id, venue_id)
       db.session.rollback()
   finally:
       db.session.close()
 
-  if error_in_insert:
+  if rejected:
+      flash(f'Show could not be created: {rejected}')
+  elif error_in_insert:
       flash(f'An error happened.  Show could not be created.')
-      print("Error while creating a show")
   else:
+      page_cache.invalidate('shows', 'venues', f'venue:{venue_id}', f'artist:{artist_id}', *area_tags)
       flash('Show was successfully listed!')
   
   return render_template('pages/home.html')
 
 
+#  Bulk import
+#  ----------------------------------------------------------------
+
+IMPORT_KINDS = ('venues', 'artists', 'shows')
+
+IMPORT_FIELDS = {
+    'venues': (Venue, VenueForm, 'seeking_talent', venue_genre_table.c.venue_id),
+    'artists': (Artist, ArtistForm, 'seeking_venue', artist_genre_table.c.artist_id),
+}
+
+def validate_entity_row(form_class, seeking_field, row):
+  """Validate one venue/artist row with the same form the web handlers use.
+
+  Returns ``(values, genres, errors)``; ``values`` are normalised the way
+  the create handlers do it (stripped strings, phone digits, boolean flag).
+  """
+  genres = bulk.split_list(row.get('genres'))
+  seeking = row.get(seeking_field)
+  if isinstance(seeking, bool):
+    seeking = 'Yes' if seeking else 'No'
+
+  formdata = MultiDict([
+      (key, '' if value is None else str(value))
+      for key, value in row.items() if key not in ('genres', seeking_field)
+  ])
+  formdata.setlist('genres', genres)
+  formdata[seeking_field] = seeking or 'No'
+
+  form = form_class(formdata=formdata, meta={'csrf': False})
+  if not form.validate():
+    return None, genres, form.errors
+
+  values = {}
+  for field in form:
+    if field.name == 'genres':
+      continue
+    if field.name == seeking_field:
+      values[field.name] = field.data == 'Yes'
+    elif field.name == 'phone':
+      values[field.name] = re.sub(r'\D', '', field.data or '')
+    else:
+      values[field.name] = (field.data or '').strip()
+  return values, genres, None
+
+def import_entities(kind, rows, batch_size, rejects):
+  model, form_class, seeking_field, genre_key = IMPORT_FIELDS[kind]
+  genre_ids = {}
+  imported = 0
+
+  for batch in bulk.batched(rows, batch_size):
+    valid = []
+    for line_number, row in batch:
+      if isinstance(row, Exception):
+        rejects.write(line_number, None, {'row': [str(row)]})
+        continue
+      values, genres, errors = validate_entity_row(form_class, seeking_field, row)
+      if errors:
+        rejects.write(line_number, row, errors)
+      else:
+        valid.append((values, genres))
+    if not valid:
+      continue
+
+    # Only names not seen in an earlier batch hit the Genre table.
+    unseen = {name for _, genres in valid for name in genres} - genre_ids.keys()
+    if unseen:
+      resolved = resolve_genres(sorted(unseen))
+      db.session.flush()
+      genre_ids.update((genre.name, genre.id) for genre in resolved)
+
+    entities = [model(**values) for values, _ in valid]
+    db.session.add_all(entities)
+    db.session.flush()
+
+    links = [
+        {"genre_id": genre_ids[name], genre_key.name: entity.id}
+        for entity, (_, genres) in zip(entities, valid)
+        for name in dict.fromkeys(genres)
+    ]
+    if links:
+      db.session.execute(genre_key.table.insert(), links)
+
+    area_tags = refresh_areas((entity.state, entity.city) for entity in entities) if kind == 'venues' else []
+    bump_cache_version(kind)
+    bump_cache_version(NAME_VERSIONS[kind])
+    db.session.commit()
+    db.session.expunge_all()
+    imported += len(entities)
+    page_cache.invalidate(kind, *area_tags)
+
+  return imported
+
+def import_shows(rows, batch_size, rejects):
+  imported = 0
+
+  # Each batch is one scheduling transaction: double bookings, against the
+  # database or earlier rows of the batch, are rejected like in the API.
+  for batch in bulk.batched(rows, batch_size):
+    imported += schedule_shows(batch, rejects)
+
+  return imported
+
+def run_import(kind, stream, format, batch_size, rejects):
+  """Import ``kind`` rows from a text stream; returns the imported count."""
+  rows = bulk.read_rows(stream, format)
+  if kind == 'shows':
+    return import_shows(rows, batch_size, rejects)
+  return import_entities(kind, rows, batch_size, rejects)
+
+@app.cli.command('import')
+@click.argument('kind', type=click.Choice(IMPORT_KINDS))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'format_', type=click.Choice(bulk.FORMATS),
+              help='Input format; guessed from the file name by default.')
+@click.option('--batch-size', type=click.IntRange(min=1), help='Rows per transaction (IMPORT_BATCH_SIZE).')
+@click.option('--rejects', 'rejects_path', type=click.Path(dir_okay=False),
+              help='Where to write rejected rows (default: PATH.rejects.ndjson).')
+def import_command(kind, path, format_, batch_size, rejects_path):
+  """Bulk-import venues, artists or shows from CSV or NDJSON (optionally gzipped)."""
+  format_ = format_ or bulk.detect_format(path)
+  batch_size = batch_size or app.config['IMPORT_BATCH_SIZE']
+  rejects_path = rejects_path or path + '.rejects.ndjson'
+  opener = gzip.open if path.endswith('.gz') else open
+
+  with opener(path, 'rt', encoding='utf-8', newline='') as stream, \
+       open(rejects_path, 'w', encoding='utf-8') as rejects_stream:
+    rejects = bulk.RejectWriter(rejects_stream)
+    imported = run_import(kind, stream, format_, batch_size, rejects)
+
+  click.echo(f'Imported {imported} {kind}, rejected {rejects.count} (see {rejects_path}).')
+
+@app.route('/import/<kind>', methods=['POST'])
+def import_upload(kind):
+  upload = request.files.get('file')
+  if kind not in IMPORT_KINDS or upload is None:
+    return jsonify({'error': 'expected a file for venues, artists or shows'}), 400
+
+  format = request.args.get('format') or bulk.detect_format(upload.filename)
+  if format not in bulk.FORMATS:
+    return jsonify({'error': f'unsupported format {format!r}'}), 400
+  batch_size = request.args.get('batch_size', app.config['IMPORT_BATCH_SIZE'], type=int)
+  if batch_size < 1:
+    return jsonify({'error': 'batch_size must be at least 1'}), 400
+
+  rejects = bulk.RejectWriter(keep=app.config['IMPORT_REPORTED_REJECTS'])
+  imported = run_import(kind, bulk.text_stream(upload.stream), format, batch_size, rejects)
+
+  return jsonify({
+      'imported': imported,
+      'rejected': rejects.count,
+      'rejects': rejects.kept
+  })
+
+
+#  Bulk export
+#  ----------------------------------------------------------------
+
+EXPORT_TABLES = {
+    'venues': Venue.__table__,
+    'artists': Artist.__table__,
+    'shows': Show.__table__,
+    'genres': Genre.__table__,
+    'venue_genres': venue_genre_table,
+    'artist_genres': artist_genre_table,
+}
+
+def stream_table(table, chunk_size, since_id=None, since=None):
+  """Yield the rows of ``table`` through a server-side cursor.
+
+  ``since_id`` / ``since`` only apply to shows and select rows with a larger
+  id or a later starting_time, for incremental exports.
+  """
+  query = db.select(list(table.columns))
+  if table is Show.__table__:
+    if since_id is not None:
+      query = query.where(table.c.id > since_id)
+    if since is not None:
+      query = query.where(table.c.starting_time >= since)
+  query = query.order_by(*table.primary_key.columns)
+
+  result = db.session.execute(query.execution_options(stream_results=True))
+  try:
+    while True:
+      rows = result.fetchmany(chunk_size)
+      if not rows:
+        break
+      for row in rows:
+        yield tuple(row)
+  finally:
+    result.close()
+
+@app.cli.command('export')
+@click.argument('output_dir', type=click.Path(file_okay=False))
+@click.option('--format', 'format_', type=click.Choice(bulk.EXPORT_FORMATS), default='ndjson',
+              help='gzip NDJSON (default), gzip CSV or Parquet (needs pyarrow).')
+@click.option('--table', 'tables', type=click.Choice(list(EXPORT_TABLES)), multiple=True,
+              help='Tables to export; repeatable. Defaults to all of them.')
+@click.option('--since-id', type=int, help='Only shows with an id above this one.')
+@click.option('--since', type=click.DateTime(), help='Only shows starting at or after this time.')
+@click.option('--chunk-size', type=int, help='Rows fetched per round trip (EXPORT_CHUNK_SIZE).')
+def export_command(output_dir, format_, tables, since_id, since, chunk_size):
+  """Dump tables to OUTPUT_DIR, one file per table, in bounded memory."""
+  if format_ == 'parquet' and bulk.pyarrow is None:
+    raise click.UsageError('Parquet export needs the pyarrow package.')
+
+  chunk_size = chunk_size or app.config['EXPORT_CHUNK_SIZE']
+  os.makedirs(output_dir, exist_ok=True)
+
+  for name in tables or EXPORT_TABLES:
+    table = EXPORT_TABLES[name]
+    path = os.path.join(output_dir, name + bulk.EXPORT_EXTENSIONS[format_])
+    rows = stream_table(table, chunk_size, since_id=since_id, since=since)
+    count = bulk.export_rows(
+        path, format_,
+        [column.name for column in table.columns],
+        [column.type.python_type for column in table.columns],
+        rows, chunk_size
+    )
+    click.echo(f'Exported {count} rows from {name} to {path}.')
+
+
+#  Show counter and area jobs
+#  ----------------------------------------------------------------
+
+@app.cli.command('rollover-shows')
+def rollover_shows_command():
+  """Move shows that have started from upcoming to past counters.
+
+  Run it every few minutes (cron, systemd timer); until it runs, a show that
+  has just started is still counted as upcoming.
+  """
+  updated = rollover_show_counters()
+  click.echo(f'Rolled over {updated["venues"]} venues and {updated["artists"]} artists.')
+
+@app.cli.command('reconcile-show-counts')
+@click.option('--dry-run', is_flag=True, help='Only report drift, do not fix it.')
+@click.option('--show', 'shown', type=int, default=10, help='Drifted rows to list per table.')
+def reconcile_show_counts_command(dry_run, shown):
+  """Compare the show counters with the Show table and fix any drift."""
+  current_time = datetime.now()
+  for kind, model, key_column in SHOW_COUNTER_MODELS:
+    drift = show_counter_drift(model, key_column, current_time)
+    total = model.query.count()
+    click.echo(f'{kind}: {len(drift)} of {total} rows drifted.')
+    for entity_id, stored, expected in drift[:shown]:
+      click.echo(f'  {entity_id}: (upcoming, past, next show) stored {stored}, expected {expected}')
+
+    if drift and not dry_run:
+      areas = set()
+      for ids in bulk.batched((entity_id for entity_id, _, _ in drift), 1000):
+        refresh_show_counters(model, key_column, model.id.in_(ids), current_time)
+        if model is Venue:
+          areas.update(venue_areas(Venue.id.in_(ids)))
+      area_tags = refresh_areas(areas)
+      bump_cache_version(kind)
+      db.session.commit()
+      page_cache.invalidate(kind, *area_tags)
+      click.echo(f'  fixed {len(drift)} rows.')
+
+@app.cli.command('refresh-areas')
+def refresh_areas_command():
+  """Rebuild every area_summary row from the Venue table."""
+  areas = set(venue_areas(db.true()))
+  areas.update(tuple(row) for row in db.session.query(AreaSummary.state, AreaSummary.city))
+  area_tags = refresh_areas(areas)
+  db.session.commit()
+  page_cache.invalidate('venues', *area_tags)
+  click.echo(f'Refreshed {len(area_tags)} areas.')
+
+
+#  API
+#  ----------------------------------------------------------------
+
+API_CHUNK_SIZE = 1000
+AUTOCOMPLETE_MAX_LIMIT = 50
+
+def api_json(value):
+  return json.dumps(value, default=lambda o: o.isoformat() if isinstance(o, datetime) else str(o))
+
+def api_collection(model, version_name):
+  """Stream every row of ``model`` as NDJSON.
+
+  Rows are read through a server-side cursor in API_CHUNK_SIZE batches, so a
+  full export runs in constant memory. The ETag is the table's counter in
+  cache_version, bumped by every write handler, so revalidation costs one
+  primary-key lookup and no scan.
+  """
+  etag = f'{version_name}-{current_cache_version(version_name)}'
+  if request.if_none_match.contains(etag):
+    return Response(status=304, headers={'ETag': f'"{etag}"'})
+
+  def generate():
+    rows = db.session.query(*model.__table__.columns).order_by(model.id).yield_per(API_CHUNK_SIZE)
+    for row in rows:
+      yield api_json(row._asdict()) + '\n'
+
+  response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+  response.set_etag(etag)
+  return response
+
+def api_document(data):
+  response = Response(api_json(data), mimetype='application/json')
+  response.add_etag()
+  return response.make_conditional(request)
+
+def api_not_found():
+  return jsonify({'error': 'not found'}), 404
+
+@app.route('/api/v1/venues')
+def api_venues():
+  return api_collection(Venue, 'venues')
+
+@app.route('/api/v1/artists')
+def api_artists():
+  return api_collection(Artist, 'artists')
+
+@app.route('/api/v1/shows')
+def api_shows():
+  return api_collection(Show, 'shows')
+
+@app.route('/api/v1/shows', methods=['POST'])
+def api_schedule_shows():
+  """Book many shows at once: ``{"shows": [{"artist_id", "venue_id",
+  "starting_time"}, ...]}``. Good rows are inserted in one transaction;
+  rejects (bad values, unknown ids, double bookings) are listed by their
+  1-based position."""
+  payload = request.get_json(silent=True)
+  rows = payload.get('shows') if isinstance(payload, dict) else None
+  if not isinstance(rows, list):
+    return jsonify({'error': 'expected {"shows": [...]}'}), 400
+  if len(rows) > app.config['SHOW_SCHEDULE_MAX_ROWS']:
+    return jsonify({'error': f'at most {app.config["SHOW_SCHEDULE_MAX_ROWS"]} shows per request'}), 413
+
+  rejects = bulk.RejectWriter(keep=len(rows))
+  scheduled = schedule_shows(enumerate(rows, start=1), rejects)
+
+  return jsonify({
+      'scheduled': scheduled,
+      'rejected': rejects.count,
+      'rejects': rejects.kept
+  })
+
+@app.route('/api/v1/venues/<int:venue_id>')
+def api_venue(venue_id):
+  venue = Venue.query.get(venue_id)
+  if not venue:
+    return api_not_found()
+
+  data = column_data(venue)
+  data["genres"] = genre_cache.names(genre_ids_of(venue_genre_table.c.venue_id, venue_id))
+  data["upcoming_shows_count"], data["past_shows_count"] = show_counts(Show.venue_id, venue_id)
+  return api_document(data)
+
+@app.route('/api/v1/artists/<int:artist_id>')
+def api_artist(artist_id):
+  artist = Artist.query.get(artist_id)
+  if not artist:
+    return api_not_found()
+
+  data = column_data(artist)
+  data["genres"] = genre_cache.names(genre_ids_of(artist_genre_table.c.artist_id, artist_id))
+  data["upcoming_shows_count"], data["past_shows_count"] = show_counts(Show.artist_id, artist_id)
+  return api_document(data)
+
+@app.route('/api/v1/shows/<int:show_id>')
+def api_show(show_id):
+  show = Show.query.get(show_id)
+  if not show:
+    return api_not_found()
+
+  return api_document(column_data(show))
+
+@app.route('/api/autocomplete')
+def api_autocomplete():
+  # Served from the in-memory name indexes; no SQL once they are loaded.
+  kind = request.args.get('type')
+  if kind not in autocomplete.indexes:
+    return jsonify({'error': 'type must be artist or venue'}), 400
+
+  limit = request.args.get('limit', app.config['AUTOCOMPLETE_LIMIT'], type=int)
+  limit = max(1, min(limit, AUTOCOMPLETE_MAX_LIMIT))
+  return jsonify(autocomplete.search(kind, request.args.get('q', ''), limit))
+
+
+#  Metrics
+#  ----------------------------------------------------------------
+
+@app.route('/metrics')
+def metrics_endpoint():
+  return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
@@ -745,16 +2137,6 @@ def server_error(error):
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
-
 #----------------------------------------------------------------------------#
 # Launch.
 #----------------------------------------------------------------------------#
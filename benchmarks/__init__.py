@@ -0,0 +1,40 @@
+#----------------------------------------------------------------------------#
+# Benchmarks.
+#
+#   python -m benchmarks.run      every route through the test client,
+#                                 compared against benchmarks/baseline.json
+#   python -m benchmarks.micro    format_datetime, name search, EXPLAIN plans
+#
+# Both load app.py against DATABASE_URL (default: a throwaway SQLite file)
+# and fill it with benchmarks.datagen first.
+#----------------------------------------------------------------------------#
+
+import os
+import tempfile
+
+
+def load_app(database_url=None, page_cache=False):
+  """Import app.py configured for benchmarking and return the module.
+
+  Settings read by config.py at import time are set through the
+  environment, so this must run before anything else imports ``app``.
+  """
+  if database_url is None:
+    database_url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='fyyur-bench-'), 'bench.db')
+  os.environ['DATABASE_URL'] = database_url
+  if not page_cache:
+    os.environ['PAGE_CACHE_BACKEND'] = 'null'
+  # Logs go to stderr (unless LOG_FILE is set); a request log line per
+  # measured request would bury the benchmark output.
+  os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+  import app as fyyur
+  fyyur.app.config['TESTING'] = True
+  fyyur.app.config['SLOW_QUERY_THRESHOLD_MS'] = None
+  # Time-based cache checks (the genre cache's cache_version lookup, the
+  # autocomplete reload thread) would add queries to whichever route is
+  # being measured when they fall due. Writes still invalidate the caches
+  # of this process directly.
+  fyyur.app.config['CACHE_VERSION_CHECK_INTERVAL'] = float('inf')
+  fyyur.app.config['AUTOCOMPLETE_REFRESH_INTERVAL'] = 0
+  return fyyur
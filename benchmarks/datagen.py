@@ -0,0 +1,175 @@
+#----------------------------------------------------------------------------#
+# Seeded synthetic data.
+#
+# Popularity follows a Zipf-like curve everywhere it matters: a few cities
+# hold most venues and artists, a few genres are on most of them, and a few
+# venues and artists play most of the shows. Show times span a year back and
+# six months ahead, on the hour, in the evening.
+#
+#   python -m benchmarks.datagen --venues 1000 --artists 5000 --shows 1000000
+#----------------------------------------------------------------------------#
+
+import argparse
+import random
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from forms import VenueForm
+
+CITIES = [
+    ('New York', 'NY'), ('Los Angeles', 'CA'), ('Chicago', 'IL'), ('Austin', 'TX'),
+    ('San Francisco', 'CA'), ('Nashville', 'TN'), ('Seattle', 'WA'), ('Boston', 'MA'),
+    ('Denver', 'CO'), ('Atlanta', 'GA'), ('Portland', 'OR'), ('New Orleans', 'LA'),
+    ('Miami', 'FL'), ('Detroit', 'MI'), ('Minneapolis', 'MN'), ('Philadelphia', 'PA'),
+    ('Dallas', 'TX'), ('Phoenix', 'AZ'), ('San Diego', 'CA'), ('Kansas City', 'MO'),
+]
+VENUE_WORDS = ['Hall', 'Room', 'Club', 'Lounge', 'Theater', 'Tavern', 'Garden', 'Stage', 'Cellar', 'Ballroom']
+ARTIST_WORDS = ['Band', 'Trio', 'Collective', 'Orchestra', 'Project', 'Ensemble', 'Quartet', 'Sound']
+ADJECTIVES = ['Blue', 'Golden', 'Velvet', 'Electric', 'Silver', 'Crimson', 'Midnight', 'Lucky',
+              'Wild', 'Quiet', 'Broken', 'Royal', 'Hidden', 'Neon', 'Rusty', 'Little']
+
+BATCH_SIZE = 5000
+
+
+def genre_names():
+  return [value for value, label in VenueForm.genres.kwargs['choices']]
+
+
+def zipf_weights(n, s=1.1):
+  """Cumulative weights for random.choices, rank i weighted 1 / (i + 1) ** s."""
+  return list(accumulate(1 / (rank + 1) ** s for rank in range(n)))
+
+
+def phone(rng):
+  return f'{rng.randint(200, 999)}{rng.randint(200, 999)}{rng.randint(0, 9999):04d}'
+
+
+def entity_rows(rng, count, words, cities, city_weights):
+  for i, (city, state) in enumerate(rng.choices(cities, cum_weights=city_weights, k=count), start=1):
+    yield {
+        "id": i,
+        "name": f'The {rng.choice(ADJECTIVES)} {rng.choice(words)} {i}',
+        "city": city,
+        "state": state,
+        "phone": phone(rng),
+        "image_link": f'https://example.com/images/{i}.jpg',
+        "facebook_link": f'https://facebook.com/fyyur{i}',
+        "website_link": f'https://example.com/{i}',
+        "seeking_description": 'Looking for regular bookings.' if i % 3 == 0 else '',
+    }
+
+
+def genre_links(rng, key, count, genre_ids, genre_weights):
+  for entity_id in range(1, count + 1):
+    picked = set(rng.choices(genre_ids, cum_weights=genre_weights, k=rng.randint(1, 3)))
+    for genre_id in picked:
+      yield {"genre_id": genre_id, key: entity_id}
+
+
+def show_rows(rng, count, venues, artists, now):
+  venue_ids = list(range(1, venues + 1))
+  artist_ids = list(range(1, artists + 1))
+  rng.shuffle(venue_ids)
+  rng.shuffle(artist_ids)
+  venue_weights = zipf_weights(venues)
+  artist_weights = zipf_weights(artists)
+  start = now.replace(minute=0, second=0, microsecond=0) - timedelta(days=365)
+
+  for i in range(1, count + 1):
+    yield {
+        "id": i,
+        "venue_id": rng.choices(venue_ids, cum_weights=venue_weights)[0],
+        "artist_id": rng.choices(artist_ids, cum_weights=artist_weights)[0],
+        "starting_time": start + timedelta(days=rng.randint(0, 545), hours=rng.randint(18, 23)),
+    }
+
+
+def insert(db, table, rows):
+  batch = []
+  for row in rows:
+    batch.append(row)
+    if len(batch) == BATCH_SIZE:
+      db.session.execute(table.insert(), batch)
+      batch = []
+  if batch:
+    db.session.execute(table.insert(), batch)
+
+
+def generate(fyyur, venues=200, artists=500, shows=20000, seed=1, now=None):
+  """Replace the database contents with a seeded synthetic data set.
+
+  Must run inside an app context. Ids are assigned explicitly (1..N) so the
+  same seed always produces the same rows.
+  """
+  db = fyyur.db
+  rng = random.Random(seed)
+  now = now or datetime.now()
+
+  db.drop_all()
+  if db.engine.dialect.name == 'postgresql':
+    db.session.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    db.session.commit()
+  db.create_all()
+
+  names = genre_names()
+  rng.shuffle(names)
+  genre_ids = list(range(1, len(names) + 1))
+  genre_weights = zipf_weights(len(names))
+  insert(db, fyyur.Genre.__table__, ({"id": i, "name": name} for i, name in enumerate(names, start=1)))
+
+  cities = list(CITIES)
+  rng.shuffle(cities)
+  city_weights = zipf_weights(len(cities))
+
+  venue_rows = entity_rows(rng, venues, VENUE_WORDS, cities, city_weights)
+  insert(db, fyyur.Venue.__table__, (
+      dict(row, address=f'{row["id"]} Main Street', seeking_talent=row["id"] % 3 == 0)
+      for row in venue_rows
+  ))
+  artist_rows = entity_rows(rng, artists, ARTIST_WORDS, cities, city_weights)
+  insert(db, fyyur.Artist.__table__, (
+      dict(row, seeking_venue=row["id"] % 3 == 0) for row in artist_rows
+  ))
+  insert(db, fyyur.venue_genre_table, genre_links(rng, 'venue_id', venues, genre_ids, genre_weights))
+  insert(db, fyyur.artist_genre_table, genre_links(rng, 'artist_id', artists, genre_ids, genre_weights))
+  insert(db, fyyur.Show.__table__, show_rows(rng, shows, venues, artists, now))
+  for kind, model, key_column in fyyur.SHOW_COUNTER_MODELS:
+    fyyur.refresh_show_counters(model, key_column, db.true(), now)
+  fyyur.refresh_areas(fyyur.venue_areas(db.true()))
+
+  if db.engine.dialect.name == 'postgresql':
+    # Explicit ids leave the sequences behind; later inserts need them past the data.
+    for table in ('Genre', 'Venue', 'Artist', 'Show'):
+      db.session.execute(
+          f'SELECT setval(pg_get_serial_sequence(\'"{table}"\', \'id\'), '
+          f'(SELECT coalesce(max(id), 1) FROM "{table}"))'
+      )
+  db.session.commit()
+  if db.engine.dialect.name == 'postgresql':
+    db.session.execute('ANALYZE')
+    db.session.commit()
+  fyyur.genre_cache.invalidate()
+
+
+def add_arguments(parser):
+  parser.add_argument('--database-url', help='defaults to a throwaway SQLite file')
+  parser.add_argument('--venues', type=int, default=200)
+  parser.add_argument('--artists', type=int, default=500)
+  parser.add_argument('--shows', type=int, default=20000)
+  parser.add_argument('--seed', type=int, default=1)
+
+
+def main():
+  from benchmarks import load_app
+
+  parser = argparse.ArgumentParser(description='Fill a database with seeded synthetic data.')
+  add_arguments(parser)
+  args = parser.parse_args()
+  fyyur = load_app(args.database_url)
+  with fyyur.app.app_context():
+    generate(fyyur, args.venues, args.artists, args.shows, args.seed)
+  print(f'{args.venues} venues, {args.artists} artists, {args.shows} shows -> {fyyur.app.config["SQLALCHEMY_DATABASE_URI"]}')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,85 @@
+#----------------------------------------------------------------------------#
+# Throughput against a running server.
+#
+#   python -m benchmarks.datagen --database-url $DATABASE_URL
+#   SECRET_KEY=... gunicorn -c gunicorn.conf.py wsgi:app
+#   python -m benchmarks.load --url http://127.0.0.1:8000 --seconds 30
+#
+# Keeps --concurrency keep-alive connections busy for --seconds and reports
+# requests per second overall and per server core. Run the client on another
+# machine, or pin it apart from the server, or it competes for the same CPU.
+#----------------------------------------------------------------------------#
+
+import argparse
+import http.client
+import itertools
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+PATHS = ['/venues', '/artists', '/shows', '/venues/1', '/artists/1', '/api/v1/venues/1']
+
+
+def worker(url, paths, deadline, results, lock):
+  parts = urlsplit(url)
+  connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+  done = errors = 0
+  latencies = []
+  for path in itertools.cycle(paths):
+    if time.perf_counter() >= deadline:
+      break
+    start = time.perf_counter()
+    try:
+      connection.request('GET', path)
+      response = connection.getresponse()
+      response.read()
+      if response.status >= 500:
+        errors += 1
+    except (OSError, http.client.HTTPException):
+      errors += 1
+      connection.close()
+      connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+      continue
+    latencies.append(time.perf_counter() - start)
+    done += 1
+  connection.close()
+  with lock:
+    results["requests"] += done
+    results["errors"] += errors
+    results["latencies"].extend(latencies)
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Measure requests per second of a running server.')
+  parser.add_argument('--url', default='http://127.0.0.1:8000')
+  parser.add_argument('--seconds', type=float, default=30)
+  parser.add_argument('--concurrency', type=int, default=16)
+  parser.add_argument('--cores', type=int, default=os.cpu_count(), help='CPU cores the server runs on')
+  parser.add_argument('--path', action='append', help='paths to cycle through (repeatable)')
+  args = parser.parse_args()
+
+  results = {"requests": 0, "errors": 0, "latencies": []}
+  lock = threading.Lock()
+  deadline = time.perf_counter() + args.seconds
+  threads = [
+      threading.Thread(target=worker, args=(args.url, args.path or PATHS, deadline, results, lock))
+      for _ in range(args.concurrency)
+  ]
+  start = time.perf_counter()
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  elapsed = time.perf_counter() - start
+
+  rps = results["requests"] / elapsed
+  latencies = sorted(results["latencies"]) or [0.0]
+  print(f'{results["requests"]} requests in {elapsed:.1f} s, {results["errors"]} errors')
+  print(f'{rps:.1f} requests/s, {rps / args.cores:.1f} requests/s per core ({args.cores} cores)')
+  print(f'latency p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, '
+        f'p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,188 @@
+#----------------------------------------------------------------------------#
+# Micro-benchmarks.
+#
+#   python -m benchmarks.micro datetime     format_datetime over 100k show times
+#   python -m benchmarks.micro search       name search, with plans; on Postgres
+#                                           also forced to a sequential scan to
+#                                           compare the trigram index with a
+#                                           plain ILIKE (try --venues 1000000)
+#   python -m benchmarks.micro plans        EXPLAIN of every SELECT the main
+#                                           pages run; exits 1 when an expected
+#                                           index is unused or a large table
+#                                           is scanned in full
+#----------------------------------------------------------------------------#
+
+import argparse
+import random
+import re
+import sys
+import time
+from datetime import datetime
+
+import babel.dates
+import dateutil.parser
+
+from benchmarks import datagen, load_app
+
+SEARCH_TERMS = ['blue', 'hall 1', 'the', 'no such venue']
+# Indexes each page's plans must use (see page_plans).
+PLAN_PAGES = {
+    '/venues': [],
+    '/artists': [],
+    '/shows': ['ix_Show_starting_time_id'],
+    '/venues/1': ['ix_venue_genre_table_venue_id', 'ix_Show_venue_id_starting_time'],
+    '/artists/1': ['ix_artist_genre_table_artist_id', 'ix_Show_artist_id_starting_time'],
+    '/api/v1/venues/1': ['ix_venue_genre_table_venue_id', 'ix_Show_venue_id_starting_time'],
+}
+# Tables no page may read in full.
+NO_FULL_SCAN = ['Show', 'venue_genre_table', 'artist_genre_table']
+
+
+def timed(function, repeat=1):
+  start = time.perf_counter()
+  for _ in range(repeat):
+    result = function()
+  return (time.perf_counter() - start) / repeat, result
+
+
+def bench_datetime(fyyur, args):
+  rng = random.Random(args.seed)
+  rows = datagen.show_rows(rng, args.values, args.venues, args.artists, datetime.now())
+  values = [row["starting_time"] for row in rows]
+  print(f'{len(values)} show times, {len(set(values))} distinct')
+
+  pattern = "EE MM, dd, y h:mma"
+  # The filter before the fast path: str() and dateutil round trip, then babel.
+  elapsed, _ = timed(lambda: [
+      babel.dates.format_datetime(dateutil.parser.parse(str(value)), pattern, locale='en') for value in values
+  ])
+  print(f'dateutil + babel (old)       {elapsed * 1000:9.1f} ms  {elapsed / len(values) * 1e6:7.2f} us/call')
+  elapsed, _ = timed(lambda: [babel.dates.format_datetime(value, pattern, locale='en') for value in values])
+  print(f'babel.dates.format_datetime  {elapsed * 1000:9.1f} ms  {elapsed / len(values) * 1e6:7.2f} us/call')
+
+  fyyur.format_datetime_cached.cache_clear()
+  elapsed, _ = timed(lambda: [fyyur.format_datetime(value) for value in values])
+  print(f'format_datetime (cold cache) {elapsed * 1000:9.1f} ms  {elapsed / len(values) * 1e6:7.2f} us/call')
+  elapsed, _ = timed(lambda: [fyyur.format_datetime(value) for value in values])
+  print(f'format_datetime (warm cache) {elapsed * 1000:9.1f} ms  {elapsed / len(values) * 1e6:7.2f} us/call')
+  print(fyyur.format_datetime_cached.cache_info())
+
+
+def bench_search(fyyur, args):
+  db, Venue = fyyur.db, fyyur.Venue
+  postgres = db.engine.dialect.name == 'postgresql'
+
+  for term in SEARCH_TERMS:
+    query = fyyur.name_search(db.session.query(Venue.id, Venue.name), Venue.name, term)
+    elapsed, rows = timed(query.all, args.repeat)
+    print(f'{term!r:16} {len(rows):7} rows  {elapsed * 1000:9.2f} ms')
+
+    if postgres:
+      # Same query with index scans off: what the ILIKE costs without pg_trgm.
+      db.session.execute('SET LOCAL enable_bitmapscan = off')
+      db.session.execute('SET LOCAL enable_indexscan = off')
+      elapsed, rows = timed(query.all, args.repeat)
+      db.session.rollback()
+      print(f'{"  seq scan":16} {len(rows):7} rows  {elapsed * 1000:9.2f} ms')
+
+    statement = query.statement.compile(db.engine)
+    with db.engine.connect() as conn:
+      print(indent(fyyur.query_stats.explain(conn, str(statement), statement_parameters(statement))))
+
+
+def statement_parameters(compiled):
+  """Bind parameters of ``compiled`` in its DB-API paramstyle."""
+  if compiled.positional:
+    return tuple(compiled.params[name] for name in compiled.positiontup)
+  return compiled.params
+
+
+def page_plans(fyyur, client, page):
+  """``[(statement, plan)]`` of every SELECT one GET of ``page`` runs.
+
+  On Postgres the plans are taken with enable_seqscan off, so the small
+  seeded tables do not hide a missing index.
+  """
+  from sqlalchemy import event
+
+  executed = []
+
+  def record(conn, cursor, statement, parameters, context, executemany):
+    executed.append((statement, parameters))
+
+  event.listen(fyyur.db.engine, 'before_cursor_execute', record)
+  try:
+    client.get(page)
+  finally:
+    event.remove(fyyur.db.engine, 'before_cursor_execute', record)
+
+  plans = []
+  with fyyur.db.engine.connect() as conn:
+    if conn.dialect.name == 'postgresql':
+      cursor = conn.connection.cursor()
+      cursor.execute('SET LOCAL enable_seqscan = off')
+      cursor.close()
+    for statement, parameters in executed:
+      plan = fyyur.query_stats.explain(conn, statement, parameters)
+      if plan is not None:
+        plans.append((statement, plan))
+  return plans
+
+
+def plan_problems(dialect, indexes, plans):
+  """Expected ``indexes`` no plan uses, and full scans of NO_FULL_SCAN tables."""
+  full_scan = re.compile(
+      (r'Seq Scan on "?({})"? ' if dialect == 'postgresql' else r'\bSCAN ({})\b(?! USING)').format(
+          '|'.join(NO_FULL_SCAN)
+      )
+  )
+  problems = [f'no plan uses {index}' for index in indexes if not any(index in plan for _, plan in plans)]
+  for _, plan in plans:
+    problems += [f'full scan of {match.group(1)}' for match in full_scan.finditer(plan)]
+  return problems
+
+
+def bench_plans(fyyur, args):
+  dialect = fyyur.db.engine.dialect.name
+  client = fyyur.app.test_client()
+  problems = []
+  for page, indexes in PLAN_PAGES.items():
+    print(f'== {page}')
+    plans = page_plans(fyyur, client, page)
+    for statement, plan in plans:
+      print(indent(statement))
+      print(indent(plan, '    -> '))
+    problems += [f'{page}: {problem}' for problem in plan_problems(dialect, indexes, plans)]
+
+  if problems:
+    print('\nUnexpected plans:')
+    for problem in problems:
+      print('  ' + problem)
+    sys.exit(1)
+  print('\nAll plans use their expected indexes.')
+
+
+def indent(text, prefix='    '):
+  return '\n'.join(prefix + line for line in (text or '').splitlines())
+
+
+BENCHMARKS = {'datetime': bench_datetime, 'search': bench_search, 'plans': bench_plans}
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Micro-benchmarks for hot helpers in app.py.')
+  parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+  datagen.add_arguments(parser)
+  parser.add_argument('--values', type=int, default=100000, help='show times for the datetime benchmark')
+  parser.add_argument('--repeat', type=int, default=20, help='runs per search term')
+  args = parser.parse_args()
+
+  fyyur = load_app(args.database_url)
+  with fyyur.app.app_context():
+    if args.benchmark != 'datetime':
+      datagen.generate(fyyur, args.venues, args.artists, args.shows, args.seed)
+    BENCHMARKS[args.benchmark](fyyur, args)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,333 @@
+#----------------------------------------------------------------------------#
+# Route benchmark.
+#
+# Drives every route in app.py through Flask's test client against a seeded
+# data set and reports, per route: p50/p95/p99 latency, SQL statements per
+# request and peak Python memory of one request. Statement budgets per route
+# are asserted by tests/test_query_budgets.py.
+# Results are compared with a stored baseline (statement counts, median
+# latency, peak memory); regressions exit non-zero.
+#
+#   python -m benchmarks.run                      compare with baseline.json
+#   python -m benchmarks.run --save-baseline      record a new baseline
+#   python -m benchmarks.run --route NAME --save-baseline
+#                                                 re-record only that route
+#
+# Statement counts do not depend on the machine; latency and memory do, so
+# record the baseline on the hardware the comparison runs on.
+#----------------------------------------------------------------------------#
+
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from urllib.parse import quote
+
+from benchmarks import datagen, load_app
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+# Latency below this many milliseconds of growth is treated as noise.
+LATENCY_NOISE_MS = 1.0
+# Peak memory below this many KiB of growth is treated as noise.
+MEMORY_NOISE_KIB = 64
+
+
+class Route:
+  """One benchmarked request.
+
+  ``request(i)`` returns ``(method, url, kwargs)`` for iteration ``i`` so
+  write routes can use fresh data each time.
+  """
+
+  def __init__(self, name, request):
+    self.name = name
+    self.request = request
+
+
+def get(url):
+  return lambda i: ('get', url, {})
+
+
+def venue_form(i):
+  genres = datagen.genre_names()
+  return {
+      "name": f'Benchmark Venue {i}', "city": 'Austin', "state": 'TX',
+      "address": '1 Bench Street', "phone": '512-555-0100', "genres": genres[:2],
+      "seeking_talent": 'Yes', "seeking_description": 'Bands wanted',
+      "image_link": '', "website_link": '', "facebook_link": '',
+  }
+
+
+def artist_form(i):
+  return dict(venue_form(i), name=f'Benchmark Artist {i}', seeking_venue='No')
+
+
+def import_file(i):
+  lines = ''.join(
+      json.dumps({
+          "name": f'Imported Venue {i}-{n}', "city": 'Austin', "state": 'TX',
+          "address": '1 Import Street', "genres": ['Jazz'], "seeking_talent": False,
+      }) + '\n'
+      for n in range(10)
+  )
+  return {"data": {"file": (io.BytesIO(lines.encode()), 'venues.ndjson')}}
+
+
+def schedule_batch(i, start):
+  """50 shows for 50 venues and artists, one day per request."""
+  starting_time = (start + timedelta(days=i)).isoformat()
+  return {"json": {"shows": [
+      {"venue_id": n, "artist_id": n, "starting_time": starting_time} for n in range(1, 51)
+  ]}}
+
+
+def build_routes(fyyur, iterations):
+  """Every route in app.py, pointed at the busiest venue and artist."""
+  db = fyyur.db
+  Show, Venue = fyyur.Show, fyyur.Venue
+  count = db.func.count(Show.id)
+  venue_id = db.session.query(Show.venue_id).group_by(Show.venue_id).order_by(count.desc()).limit(1).scalar()
+  artist_id = db.session.query(Show.artist_id).group_by(Show.artist_id).order_by(count.desc()).limit(1).scalar()
+  show = Show.query.order_by(Show.starting_time, Show.id).offset(fyyur.app.config['SHOWS_LISTING_PER_PAGE']).first()
+  show_id, cursor = show.id, fyyur.encode_show_cursor(show.starting_time, show.id)
+  city, state = db.session.query(Venue.city, Venue.state).filter(Venue.id == venue_id).one()
+  AreaSummary = fyyur.AreaSummary
+  big_area = AreaSummary.query.order_by(AreaSummary.venues_count.desc()).first()
+  area_path = f'/areas/{quote(big_area.state)}/{quote(big_area.city)}'
+  links = fyyur.venue_genre_table
+  genre = db.session.query(fyyur.Genre.name).join(links, links.c.genre_id == fyyur.Genre.id).group_by(
+      fyyur.Genre.name
+  ).order_by(db.func.count().desc()).limit(1).scalar()
+  facets = f'state={quote(big_area.state)}&city={quote(big_area.city)}&genres={quote(genre)}&seeking=yes'
+
+  # Venues without shows for the DELETE route, one per request.
+  doomed = [Venue(name=f'Doomed Venue {i}', city='Austin', state='TX') for i in range(iterations + 2)]
+  db.session.add_all(doomed)
+  fyyur.refresh_areas([('TX', 'Austin')])
+  db.session.commit()
+  doomed_ids = [venue.id for venue in doomed]
+  db.session.remove()
+
+  # Past the generated shows and 3 hours apart, so no request is a double booking.
+  show_time = datetime.now() + timedelta(days=730)
+
+  return [
+      Route('index', get('/')),
+      Route('venues', get('/venues')),
+      Route('show_area', get(area_path)),
+      Route('venues_search', lambda i: ('post', '/venues/search', {"data": {"search_term": 'blue'}})),
+      Route('venues_search_facets', get(f'/venues/search?{facets}')),
+      Route('show_venue', get(f'/venues/{venue_id}')),
+      Route('show_venue_older', get(f'/venues/{venue_id}?before={fyyur.encode_show_cursor(datetime.now(), 0)}')),
+      Route('create_venue_form', get('/venues/create')),
+      Route('create_venue', lambda i: ('post', '/venues/create', {"data": venue_form(i)})),
+      Route('edit_venue_form', get(f'/venues/{venue_id}/edit')),
+      Route('edit_venue', lambda i: ('post', f'/venues/{venue_id}/edit', {"data": venue_form(i)})),
+      Route('delete_venue', lambda i: ('delete', f'/venues/{doomed_ids[i]}', {})),
+      Route('artists', get('/artists')),
+      Route('artists_search', lambda i: ('post', '/artists/search', {"data": {"search_term": 'band'}})),
+      Route('artists_search_facets', get(f'/artists/search?search_term=band&{facets}')),
+      Route('show_artist', get(f'/artists/{artist_id}')),
+      Route('create_artist_form', get('/artists/create')),
+      Route('create_artist', lambda i: ('post', '/artists/create', {"data": artist_form(i)})),
+      Route('edit_artist_form', get(f'/artists/{artist_id}/edit')),
+      Route('edit_artist', lambda i: ('post', f'/artists/{artist_id}/edit', {"data": artist_form(i)})),
+      Route('shows', get('/shows')),
+      Route('shows_next_page', get(f'/shows?after={cursor}')),
+      Route('shows_filtered', get(f'/shows?city={city}&venue_id={venue_id}')),
+      Route('create_show_form', get('/shows/create')),
+      Route('create_show', lambda i: ('post', '/shows/create', {"data": {
+          "artist_id": str(artist_id), "venue_id": str(venue_id),
+          "starting_time": (show_time + timedelta(hours=3 * i)).strftime('%Y-%m-%d %H:%M:%S'),
+      }})),
+      Route('import_venues', lambda i: ('post', '/import/venues', import_file(i))),
+      Route('schedule_shows', lambda i: ('post', '/api/v1/shows', schedule_batch(i, show_time + timedelta(days=365)))),
+      Route('api_venues', get('/api/v1/venues')),
+      Route('api_artists', get('/api/v1/artists')),
+      Route('api_shows', get('/api/v1/shows')),
+      Route('api_venue', get(f'/api/v1/venues/{venue_id}')),
+      Route('api_artist', get(f'/api/v1/artists/{artist_id}')),
+      Route('api_show', get(f'/api/v1/shows/{show_id}')),
+      Route('autocomplete', get('/api/autocomplete?type=artist&q=the blue')),
+      Route('metrics', get('/metrics')),
+  ]
+
+
+def percentile(sorted_values, fraction):
+  index = min(len(sorted_values) - 1, round(fraction * (len(sorted_values) - 1)))
+  return sorted_values[index]
+
+
+def csrf_token(client):
+  """CSRF token of the client's session, read from a rendered form."""
+  page = client.get('/shows/create').get_data(as_text=True)
+  return re.search(r'name="csrf_token" type="hidden" value="([^"]+)"', page).group(1)
+
+
+def measure(fyyur, route, iterations, warmup):
+  """Latency and statement counts over ``iterations`` requests, then peak
+  memory of one more request measured separately under tracemalloc."""
+  client = fyyur.app.test_client()
+  token = csrf_token(client)
+
+  def send(i):
+    method, url, kwargs = route.request(i)
+    if "data" in kwargs:
+      kwargs["data"]["csrf_token"] = token
+    response = getattr(client, method)(url, **kwargs)
+    response.get_data()
+    return response
+
+  for i in range(warmup):
+    send(i)
+  # Start every route from a clean heap so earlier routes' garbage is not
+  # collected on this route's clock.
+  gc.collect()
+
+  timings = []
+  statements = []
+  status = None
+  for i in range(warmup, warmup + iterations):
+    with fyyur.query_stats.count_queries() as executed:
+      start = time.perf_counter()
+      response = send(i)
+      timings.append((time.perf_counter() - start) * 1000)
+    statements.append(len(executed))
+    status = response.status_code
+
+  tracemalloc.start()
+  try:
+    send(warmup + iterations)
+    _, peak = tracemalloc.get_traced_memory()
+  finally:
+    tracemalloc.stop()
+
+  timings.sort()
+  return {
+      "status": status,
+      "p50_ms": round(percentile(timings, 0.50), 3),
+      "p95_ms": round(percentile(timings, 0.95), 3),
+      "p99_ms": round(percentile(timings, 0.99), 3),
+      "queries": max(statements),
+      "queries_median": statistics.median(statements),
+      "peak_kib": round(peak / 1024, 1),
+  }
+
+
+def compare(baseline, results, tolerance):
+  """Regressions of ``results`` against ``baseline`` as readable lines."""
+  problems = []
+  for name, current in results["routes"].items():
+    previous = baseline.get("routes", {}).get(name)
+    if previous is None:
+      continue
+    if current["queries"] > previous["queries"]:
+      problems.append(f'{name}: {current["queries"]} queries per request, baseline {previous["queries"]}')
+    # Tails of a hundred samples swing with scheduler and GC noise; they
+    # are reported for reading, the median is what gets compared.
+    limit = max(previous["p50_ms"] * (1 + tolerance), previous["p50_ms"] + LATENCY_NOISE_MS)
+    if current["p50_ms"] > limit:
+      problems.append(f'{name}: p50 {current["p50_ms"]:.2f} ms, baseline {previous["p50_ms"]:.2f} ms')
+    limit = max(previous["peak_kib"] * (1 + tolerance), previous["peak_kib"] + MEMORY_NOISE_KIB)
+    if current["peak_kib"] > limit:
+      problems.append(f'{name}: peak {current["peak_kib"]:.0f} KiB, baseline {previous["peak_kib"]:.0f} KiB')
+  return problems
+
+
+def same_data_set(baseline, results):
+  return all(baseline["meta"][key] == results["meta"][key] for key in ('venues', 'artists', 'shows', 'seed', 'database'))
+
+
+def report(results, out=sys.stdout):
+  header = f'{"route":<22} {"status":>6} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"queries":>8} {"peak KiB":>9}'
+  print(header, file=out)
+  print('-' * len(header), file=out)
+  for name, row in results["routes"].items():
+    print(
+        f'{name:<22} {row["status"]:>6} {row["p50_ms"]:>9.2f} {row["p95_ms"]:>9.2f} '
+        f'{row["p99_ms"]:>9.2f} {row["queries"]:>8} {row["peak_kib"]:>9.1f}',
+        file=out
+    )
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmark every route against a seeded data set.')
+  datagen.add_arguments(parser)
+  parser.add_argument('--iterations', type=int, default=100, help='measured requests per route')
+  parser.add_argument('--warmup', type=int, default=3, help='unmeasured requests per route first')
+  parser.add_argument('--route', action='append', help='only run these routes (repeatable)')
+  parser.add_argument('--page-cache', action='store_true', help='keep the page cache on (off by default)')
+  parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+  parser.add_argument('--save-baseline', action='store_true',
+                      help='write the results as the new baseline; with --route, only update those routes')
+  parser.add_argument('--tolerance', type=float, default=0.5, help='allowed latency/memory growth, 0.5 = 50%%')
+  parser.add_argument('--output', help='also write the results JSON here')
+  args = parser.parse_args()
+
+  fyyur = load_app(args.database_url, page_cache=args.page_cache)
+  with fyyur.app.app_context():
+    datagen.generate(fyyur, args.venues, args.artists, args.shows, args.seed)
+    routes = build_routes(fyyur, args.warmup + args.iterations)
+    database = fyyur.db.engine.dialect.name
+  if args.route:
+    routes = [route for route in routes if route.name in args.route]
+
+  # Measured outside the app context above: requests push their own, so
+  # flask.g (CSRF token, query counts) starts fresh on each one.
+  results = {
+      "meta": {
+          "venues": args.venues, "artists": args.artists, "shows": args.shows, "seed": args.seed,
+          "iterations": args.iterations, "page_cache": args.page_cache, "database": database,
+          "python": platform.python_version(), "machine": platform.machine(),
+          "created": datetime.now().isoformat(timespec='seconds'),
+      },
+      "routes": {route.name: measure(fyyur, route, args.iterations, args.warmup) for route in routes},
+  }
+
+  report(results)
+  if args.output:
+    with open(args.output, 'w') as out:
+      json.dump(results, out, indent=2)
+
+  problems = []
+  if args.save_baseline:
+    saved = results
+    if args.route and os.path.exists(args.baseline):
+      with open(args.baseline) as f:
+        saved = json.load(f)
+      if not same_data_set(saved, results):
+        sys.exit(f'\n{args.baseline} was recorded with a different data set or database; '
+                 'record it whole (without --route).')
+      saved["routes"].update(results["routes"])
+    with open(args.baseline, 'w') as out:
+      json.dump(saved, out, indent=2)
+    print(f'\nBaseline written to {args.baseline}')
+  elif os.path.exists(args.baseline):
+    with open(args.baseline) as f:
+      baseline = json.load(f)
+    if not same_data_set(baseline, results):
+      print('\nBaseline was recorded with a different data set or database; not comparing.')
+    else:
+      problems += compare(baseline, results, args.tolerance)
+  else:
+    print(f'\nNo baseline at {args.baseline}; run with --save-baseline to record one.')
+
+  if problems:
+    print('\nRegressions:')
+    for problem in problems:
+      print('  ' + problem)
+    sys.exit(1)
+  print('\nNo regressions.')
+
+
+if __name__ == '__main__':
+  main()
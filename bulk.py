@@ -0,0 +1,173 @@
+#----------------------------------------------------------------------------#
+# Streaming readers and writers for bulk import/export.
+#
+# Everything here works on one row (or one chunk) at a time so files of any
+# size can be processed in bounded memory; the database side lives in app.py.
+#----------------------------------------------------------------------------#
+
+import csv
+import gzip
+import io
+import json
+from datetime import datetime
+from itertools import islice
+
+try:
+  import pyarrow
+  import pyarrow.parquet
+except ImportError:
+  pyarrow = None
+
+FORMATS = ('csv', 'ndjson')
+EXPORT_FORMATS = ('ndjson', 'csv', 'parquet')
+EXPORT_EXTENSIONS = {'ndjson': '.ndjson.gz', 'csv': '.csv.gz', 'parquet': '.parquet'}
+
+# Multi-valued CSV cells (genres) are separated with this character.
+CSV_LIST_SEPARATOR = ';'
+
+
+def detect_format(filename, default='ndjson'):
+  name = (filename or '').lower()
+  if name.endswith('.gz'):
+    name = name[:-3]
+  if name.endswith('.csv'):
+    return 'csv'
+  if name.endswith(('.ndjson', '.jsonl', '.json')):
+    return 'ndjson'
+  return default
+
+
+def text_stream(stream):
+  """Wrap a binary upload stream for line-based reading."""
+  if isinstance(stream, io.TextIOBase):
+    return stream
+  return io.TextIOWrapper(stream, encoding='utf-8', newline='')
+
+
+def read_rows(stream, format):
+  """Yield ``(line_number, row)`` pairs from a CSV or NDJSON text stream.
+
+  Lines that cannot be decoded are yielded with ``row`` set to the
+  exception, so the caller can reject them like any other bad row.
+  """
+  if format == 'csv':
+    reader = csv.DictReader(stream)
+    for row in reader:
+      yield reader.line_num, row
+    return
+
+  for line_number, line in enumerate(stream, start=1):
+    line = line.strip()
+    if not line:
+      continue
+    try:
+      row = json.loads(line)
+    except ValueError as e:
+      yield line_number, e
+      continue
+    if not isinstance(row, dict):
+      yield line_number, ValueError('expected a JSON object')
+      continue
+    yield line_number, row
+
+
+def split_list(value):
+  """Normalise a list-valued cell (NDJSON list or CSV string) to a list."""
+  if value is None:
+    return []
+  if isinstance(value, str):
+    return [item.strip() for item in value.split(CSV_LIST_SEPARATOR) if item.strip()]
+  return [str(item).strip() for item in value]
+
+
+def batched(iterable, size):
+  iterator = iter(iterable)
+  while True:
+    batch = list(islice(iterator, size))
+    if not batch:
+      return
+    yield batch
+
+
+class RejectWriter:
+  """Collects rejected rows as NDJSON lines: line number, row and errors.
+
+  ``keep`` limits how many rejects are also held in memory for reporting.
+  """
+
+  def __init__(self, stream=None, keep=0):
+    self.stream = stream
+    self.keep = keep
+    self.count = 0
+    self.kept = []
+
+  def write(self, line_number, row, errors):
+    self.count += 1
+    record = {"line": line_number, "row": row if isinstance(row, dict) else None, "errors": errors}
+    if self.stream is not None:
+      self.stream.write(json.dumps(record, default=str) + '\n')
+    if len(self.kept) < self.keep:
+      self.kept.append(record)
+
+
+def json_value(value):
+  return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def write_ndjson(path, columns, rows, chunk_size, types=None):
+  count = 0
+  with gzip.open(path, 'wt', encoding='utf-8') as out:
+    for row in rows:
+      out.write(json.dumps(dict(zip(columns, row)), default=json_value) + '\n')
+      count += 1
+  return count
+
+
+def write_csv(path, columns, rows, chunk_size, types=None):
+  count = 0
+  with gzip.open(path, 'wt', encoding='utf-8', newline='') as out:
+    writer = csv.writer(out)
+    writer.writerow(columns)
+    for row in rows:
+      writer.writerow([value.isoformat() if isinstance(value, datetime) else value for value in row])
+      count += 1
+  return count
+
+
+def arrow_schema(columns, types):
+  arrow_types = {
+      int: pyarrow.int64(),
+      str: pyarrow.string(),
+      bool: pyarrow.bool_(),
+      datetime: pyarrow.timestamp('us'),
+  }
+  return pyarrow.schema([(column, arrow_types[type_]) for column, type_ in zip(columns, types)])
+
+
+def write_parquet(path, columns, rows, chunk_size, types=None):
+  """Columnar output, one row group per ``chunk_size`` rows (needs pyarrow).
+
+  ``types`` are the Python types of the columns; the schema is fixed up
+  front so a chunk where a column happens to be all NULL still matches.
+  """
+  if pyarrow is None:
+    raise RuntimeError('Parquet export needs the pyarrow package.')
+
+  schema = arrow_schema(columns, types)
+  count = 0
+  with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+    for chunk in batched(rows, chunk_size):
+      writer.write_table(pyarrow.Table.from_pydict(
+          {column: [row[i] for row in chunk] for i, column in enumerate(columns)},
+          schema=schema
+      ))
+      count += len(chunk)
+  return count
+
+
+EXPORT_WRITERS = {'ndjson': write_ndjson, 'csv': write_csv, 'parquet': write_parquet}
+
+
+def export_rows(path, format, columns, types, rows, chunk_size):
+  """Write ``rows`` (tuples in ``columns`` order) to ``path``; returns the row count."""
+  return EXPORT_WRITERS[format](path, columns, rows, chunk_size, types=types)
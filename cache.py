@@ -0,0 +1,187 @@
+#----------------------------------------------------------------------------#
+# Page cache.
+#
+# Rendered GET pages are stored under a key built from the request path and
+# query string, together with the versions of the tags they depend on
+# (e.g. 'venue:3', 'shows'). Write handlers bump tag versions through
+# PageCache.invalidate(); an entry whose tag versions no longer match is a
+# miss. Entries also carry a TTL because upcoming/past splits move with time.
+#----------------------------------------------------------------------------#
+
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import g, request, session, make_response
+
+import metrics
+
+
+class NullBackend:
+  """Backend that stores nothing; used to switch the cache off."""
+
+  def get(self, key):
+    return None
+
+  def set(self, key, value, ttl):
+    pass
+
+  def get_counters(self, names):
+    return [0] * len(names)
+
+  def incr(self, name):
+    pass
+
+
+class LRUBackend:
+  """In-process LRU store. Each worker keeps its own copy, tag counters
+  included, so it is only correct with a single worker process.
+
+  Tag counters live outside the LRU so they are never evicted; evicting a
+  counter could make an old entry look current again.
+  """
+
+  def __init__(self, max_entries=1024):
+    self.max_entries = max_entries
+    self._entries = OrderedDict()
+    self._counters = {}
+    self._lock = threading.Lock()
+
+  def get(self, key):
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is None:
+        return None
+      value, expires_at = entry
+      if expires_at < time.monotonic():
+        del self._entries[key]
+        return None
+      self._entries.move_to_end(key)
+      return value
+
+  def set(self, key, value, ttl):
+    with self._lock:
+      self._entries[key] = (value, time.monotonic() + ttl)
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.max_entries:
+        self._entries.popitem(last=False)
+
+  def get_counters(self, names):
+    with self._lock:
+      return [self._counters.get(name, 0) for name in names]
+
+  def incr(self, name):
+    with self._lock:
+      self._counters[name] = self._counters.get(name, 0) + 1
+
+
+class RedisBackend:
+  """Shared store for multi-worker deployments (needs the redis package)."""
+
+  def __init__(self, url, prefix='fyyur:page:'):
+    try:
+      import redis
+    except ImportError:
+      raise RuntimeError(
+          'PAGE_CACHE_BACKEND=redis needs the redis package (pip install -r requirements.txt).'
+      ) from None
+    self.client = redis.Redis.from_url(url)
+    self.prefix = prefix
+
+  def get(self, key):
+    value = self.client.get(self.prefix + key)
+    return pickle.loads(value) if value is not None else None
+
+  def set(self, key, value, ttl):
+    self.client.setex(self.prefix + key, int(ttl), pickle.dumps(value))
+
+  def get_counters(self, names):
+    values = self.client.mget([self.prefix + 'tag:' + name for name in names])
+    return [int(value) if value is not None else 0 for value in values]
+
+  def incr(self, name):
+    self.client.incr(self.prefix + 'tag:' + name)
+
+
+def make_backend(config):
+  backend = config.get('PAGE_CACHE_BACKEND', 'memory')
+  if backend == 'memory':
+    return LRUBackend(config.get('PAGE_CACHE_MAX_ENTRIES', 1024))
+  if backend == 'redis':
+    return RedisBackend(config['PAGE_CACHE_REDIS_URL'])
+  if backend in ('null', None):
+    return NullBackend()
+  # Anything else is taken as an already-built backend object.
+  return backend
+
+
+class PageCache:
+
+  def __init__(self, app=None):
+    self.backend = NullBackend()
+    self.default_ttl = 60
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    self.backend = make_backend(app.config)
+    self.default_ttl = app.config.get('PAGE_CACHE_TTL', 60)
+
+  def tag(self, *tags):
+    """Record tags the page being rendered depends on."""
+    g.setdefault('page_cache_tags', set()).update(tags)
+
+  def invalidate(self, *tags):
+    for tag in set(tags):
+      self.backend.incr(tag)
+    # Global write counter, see cached().
+    self.backend.incr('*')
+
+  def cached(self, ttl=None):
+    """Decorator for GET views whose output only depends on the URL."""
+
+    def decorator(view):
+      @wraps(view)
+      def wrapper(*args, **kwargs):
+        # Flashed messages are rendered into the page and belong to one
+        # visitor, so those requests neither read nor fill the cache.
+        if request.method != 'GET' or '_flashes' in session:
+          metrics.cache_requests.inc('page', 'bypass')
+          return view(*args, **kwargs)
+
+        key = request.full_path
+        entry = self.backend.get(key)
+        if entry is not None:
+          body, status, mimetype, tag_versions = entry
+          tags = list(tag_versions)
+          if self.backend.get_counters(tags) == [tag_versions[tag] for tag in tags]:
+            metrics.cache_requests.inc('page', 'hit')
+            return make_response(body, status, {'Content-Type': mimetype})
+
+        metrics.cache_requests.inc('page', 'miss')
+
+        # Tags are only known once the view has run. If any invalidation
+        # lands while it renders, the page may hold pre-write data under
+        # post-write versions, so it is served but not stored.
+        [writes_before] = self.backend.get_counters(['*'])
+        g.page_cache_tags = set()
+        response = make_response(view(*args, **kwargs))
+        tags = sorted(g.page_cache_tags)
+        versions = self.backend.get_counters(tags + ['*'])
+        writes_after = versions.pop()
+        tag_versions = dict(zip(tags, versions))
+
+        if (response.status_code == 200 and not response.direct_passthrough
+            and writes_before == writes_after):
+          self.backend.set(
+              key,
+              (response.get_data(), response.status_code, response.content_type, tag_versions),
+              ttl or self.default_ttl
+          )
+        return response
+
+      return wrapper
+
+    return decorator
@@ -1,7 +1,10 @@
 from datetime import datetime
 from flask_wtf import Form
 from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL, Optional
+from wtforms.validators import DataRequired, AnyOf, URL, Optional, Regexp
+
+# Ten digits, any separators; the handlers keep only the digits.
+PHONE_PATTERN = r'^\D*(\d\D*){10}$'
 
 class ShowForm(Form):
     artist_id = StringField(
@@ -83,7 +86,7 @@ class VenueForm(Form):
         'address', validators=[DataRequired()]
     )
     phone = StringField(
-        'phone'
+        'phone', validators=[Optional(), Regexp(PHONE_PATTERN, message='Phone must have 10 digits.')]
     )
     image_link = StringField(
         'image_link'
@@ -198,8 +201,7 @@ class ArtistForm(Form):
         ]
     )
     phone = StringField(
-        # TODO implement validation logic for state
-        'phone'
+        'phone', validators=[Optional(), Regexp(PHONE_PATTERN, message='Phone must have 10 digits.')]
     )
     image_link = StringField(
         'image_link'
@@ -0,0 +1,85 @@
+#----------------------------------------------------------------------------#
+# Gunicorn settings.
+#
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Every setting can be overridden from the environment. Size the database
+# pool so that workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) stays under the
+# server's max_connections, and keep GUNICORN_THREADS within one worker's
+# pool.
+#----------------------------------------------------------------------------#
+
+import glob
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:' + os.environ.get('PORT', '8000'))
+
+# Pages are mostly database waits, so a couple of processes per core keeps
+# the CPU busy; threads add concurrency per process at lower memory cost.
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Import the app once in the master and fork it: workers share the loaded
+# code pages and a broken configuration fails the boot (see wsgi.self_check).
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+# Recycle workers after this many requests (0 = never), with jitter so they
+# do not all restart at once.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 50))
+
+# The app writes its own JSON request log (logs.py).
+accesslog = None
+errorlog = '-'
+
+
+def check_settings(cfg):
+  """Raise RuntimeError if the resolved worker settings break the app.
+
+  Runs on the settings gunicorn actually uses, so values given with -w/
+  --threads or another config file are checked too, not only the
+  GUNICORN_* variables read above.
+  """
+  import config
+
+  problems = []
+  if cfg.workers > 1 and config.PAGE_CACHE_BACKEND == 'memory':
+    problems.append(
+        f'PAGE_CACHE_BACKEND=memory with {cfg.workers} workers: each worker keeps its own '
+        'tag versions, so a write made through one worker leaves stale pages in the others. '
+        'Use PAGE_CACHE_BACKEND=redis (or null), or a single worker.'
+    )
+
+  connections = config.DB_POOL_SIZE + config.DB_MAX_OVERFLOW
+  if cfg.threads > connections:
+    problems.append(
+        f'{cfg.threads} threads per worker exceed DB_POOL_SIZE + DB_MAX_OVERFLOW = {connections}; '
+        'threads would queue for a connection.'
+    )
+
+  if problems:
+    raise RuntimeError('Startup self-check failed:\n  ' + '\n  '.join(problems))
+
+
+def on_starting(server):
+  if os.environ.get('STARTUP_SELF_CHECK', '1') == '1':
+    check_settings(server.cfg)
+
+  # Snapshots left by the previous run would be added to this run's metrics.
+  directory = os.environ.get('METRICS_MULTIPROC_DIR')
+  if directory:
+    for path in glob.glob(os.path.join(directory, '*.json')):
+      os.remove(path)
+
+
+def post_fork(server, worker):
+  if server.cfg.preload_app:
+    # Pooled connections inherited from the master are shared sockets;
+    # drop them without closing so each worker opens its own.
+    from app import db
+    db.engine.dispose(close=False)
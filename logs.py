@@ -0,0 +1,176 @@
+#----------------------------------------------------------------------------#
+# Structured logging.
+#
+# Request threads only put records on a bounded queue; a QueueListener
+# thread formats them as one JSON object per line and writes them to a
+# rotating file (or stderr). Request context (request id, route, DB time so
+# far) is attached before the record is queued, since the writer thread has
+# none. When the queue is full records are dropped and counted rather than
+# blocking the request.
+#----------------------------------------------------------------------------#
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import uuid
+import zlib
+from datetime import datetime, timezone
+
+from flask import g, has_request_context, request
+from flask.logging import default_handler
+
+import metrics
+
+# Attributes every LogRecord has; anything else on a record came in through
+# ``extra=`` and is written out as a field.
+RESERVED_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'exception'}
+
+records_dropped = metrics.registry.counter(
+    'log_records_dropped_total', 'Log records dropped because the log queue was full.'
+)
+
+
+class JSONFormatter(logging.Formatter):
+
+  def format(self, record):
+    entry = {
+        "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+        "level": record.levelname,
+        "logger": record.name,
+        "message": record.getMessage(),
+    }
+    for key, value in vars(record).items():
+      if key not in RESERVED_ATTRIBUTES and not key.startswith('_'):
+        entry[key] = value
+    exception = getattr(record, 'exception', None)
+    if exception is None and record.exc_info:
+      exception = self.formatException(record.exc_info)
+    if exception:
+      entry["exception"] = exception
+    return json.dumps(entry, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+  """Adds request id, route and DB time so far to records logged in a request."""
+
+  def filter(self, record):
+    if has_request_context():
+      defaults = {
+          "request_id": g.get('request_id'),
+          "route": request.endpoint,
+          "method": request.method,
+          "path": request.path,
+          "db_time_ms": round(g.get('db_time', 0.0) * 1000, 3),
+      }
+      for key, value in defaults.items():
+        if not hasattr(record, key):
+          setattr(record, key, value)
+    return True
+
+
+class SamplingFilter(logging.Filter):
+  """Keeps a fraction of INFO and lower records of chosen loggers.
+
+  ``rates`` maps logger names to the fraction kept. Records with a request
+  id are sampled by a hash of it, so a request's records are kept or
+  dropped together. Warnings and errors always pass.
+  """
+
+  def __init__(self, rates):
+    super().__init__()
+    self.rates = rates
+
+  def filter(self, record):
+    rate = self.rates.get(record.name)
+    if rate is None or rate >= 1 or record.levelno > logging.INFO:
+      return True
+    request_id = getattr(record, 'request_id', None)
+    if request_id:
+      return zlib.crc32(request_id.encode()) / 2 ** 32 < rate
+    return random.random() < rate
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+  """QueueHandler that drops records when the queue is full."""
+
+  def enqueue(self, record):
+    try:
+      self.queue.put_nowait(record)
+    except queue.Full:
+      records_dropped.inc()
+
+  def prepare(self, record):
+    # Render the message and traceback here, on the logging thread; the
+    # listener must not touch args or exc_info objects that may change.
+    record = copy.copy(record)
+    record.message = record.getMessage()
+    if record.exc_info:
+      record.exception = logging.Formatter().formatException(record.exc_info)
+    record.msg = record.message
+    record.args = None
+    record.exc_info = None
+    record.exc_text = None
+    return record
+
+
+def output_handler(config):
+  path = config.get('LOG_FILE')
+  if not path:
+    return logging.StreamHandler(sys.stderr)
+  if config.get('LOG_ROTATE_WHEN'):
+    return logging.handlers.TimedRotatingFileHandler(
+        path, when=config['LOG_ROTATE_WHEN'], backupCount=config.get('LOG_BACKUP_COUNT', 5)
+    )
+  return logging.handlers.RotatingFileHandler(
+      path, maxBytes=config.get('LOG_MAX_BYTES', 0), backupCount=config.get('LOG_BACKUP_COUNT', 5)
+  )
+
+
+def init_app(app):
+  """Route app.logger and the 'fyyur.*' loggers through the JSON log queue."""
+  output = output_handler(app.config)
+  output.setFormatter(JSONFormatter())
+
+  log_queue = queue.Queue(app.config.get('LOG_QUEUE_SIZE', 10000))
+  handler = NonBlockingQueueHandler(log_queue)
+  handler.addFilter(RequestContextFilter())
+  handler.addFilter(SamplingFilter(app.config.get('LOG_SAMPLE_RATES', {})))
+
+  listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+  listener.start()
+  atexit.register(listener.stop)
+
+  def restart_listener():
+    # The writer thread does not survive a fork (gunicorn --preload), and
+    # the queue's locks may have been held by it, so children start afresh.
+    handler.queue = listener.queue = queue.Queue(log_queue.maxsize)
+    listener.start()
+
+  os.register_at_fork(after_in_child=restart_listener)
+
+  level = app.config.get('LOG_LEVEL', 'INFO')
+  app.logger.removeHandler(default_handler)
+  for logger in (app.logger, logging.getLogger('fyyur')):
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = False
+
+  @app.before_request
+  def assign_request_id():
+    # Reuse the id of a proxy in front of us so both logs line up.
+    incoming = request.headers.get('X-Request-ID', '')
+    g.request_id = incoming if 0 < len(incoming) <= 128 else uuid.uuid4().hex
+
+  @app.after_request
+  def return_request_id(response):
+    if 'request_id' in g:
+      response.headers['X-Request-ID'] = g.request_id
+    return response
+
+  return listener
@@ -0,0 +1,354 @@
+#----------------------------------------------------------------------------#
+# Metrics.
+#
+# A small in-process registry rendered in the Prometheus text exposition
+# format at /metrics. Recording is a dict update under a lock, cheap enough
+# for the request path.
+#
+# Under a pre-forking server each worker has its own registry. With
+# METRICS_MULTIPROC_DIR set, every process writes a snapshot of its values
+# to <dir>/<pid>.json (from a background thread, at most once per
+# METRICS_FLUSH_INTERVAL seconds) and /metrics adds up the snapshots of all
+# processes, so whichever worker answers the scrape reports the whole server.
+# Counters and histograms of exited workers are kept; their gauges are not.
+# The directory must be emptied when the server starts.
+#----------------------------------------------------------------------------#
+
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+
+import jinja2
+from flask import g, has_app_context, request
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_labels(names, values):
+  if not names:
+    return ''
+  pairs = ','.join(
+      '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+      for name, value in zip(names, values)
+  )
+  return '{' + pairs + '}'
+
+
+class Metric:
+  kind = None
+
+  def __init__(self, name, documentation, labelnames=()):
+    self.name = name
+    self.documentation = documentation
+    self.labelnames = tuple(labelnames)
+    self.lock = threading.Lock()
+    self.values = {}
+
+  def header(self):
+    return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+  def collect(self):
+    """Copy of the current values: label tuple -> value."""
+    with self.lock:
+      return dict(self.values)
+
+  def merge(self, total, value):
+    return total + value
+
+  def samples(self, values):
+    return [(self.name, self.labelnames, labels, value) for labels, value in values.items()]
+
+
+class Counter(Metric):
+  kind = 'counter'
+
+  def inc(self, *labels, amount=1):
+    with self.lock:
+      self.values[labels] = self.values.get(labels, 0) + amount
+
+  def samples(self, values):
+    if not values and not self.labelnames:
+      return [(self.name, (), (), 0)]
+    return super().samples(values)
+
+
+class Gauge(Metric):
+  """Gauge read from ``callback`` at scrape time, or set explicitly."""
+
+  kind = 'gauge'
+
+  def __init__(self, name, documentation, labelnames=(), callback=None):
+    super().__init__(name, documentation, labelnames)
+    self.callback = callback
+
+  def set(self, value, *labels):
+    with self.lock:
+      self.values[labels] = value
+
+  def collect(self):
+    if self.callback is not None:
+      return {(): self.callback()}
+    return super().collect()
+
+
+class Histogram(Metric):
+  kind = 'histogram'
+
+  def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    super().__init__(name, documentation, labelnames)
+    self.buckets = tuple(buckets)
+    # labels -> [bucket counts..., sum, count]
+
+  def observe(self, value, *labels):
+    with self.lock:
+      state = self.values.get(labels)
+      if state is None:
+        state = self.values[labels] = [0] * (len(self.buckets) + 2)
+      for i, bound in enumerate(self.buckets):
+        if value <= bound:
+          state[i] += 1
+      state[-2] += value
+      state[-1] += 1
+
+  def collect(self):
+    with self.lock:
+      return {labels: list(state) for labels, state in self.values.items()}
+
+  def merge(self, total, value):
+    return [a + b for a, b in zip(total, value)]
+
+  def samples(self, values):
+    bucket_labelnames = self.labelnames + ('le',)
+    samples = []
+    for labels, state in values.items():
+      for bound, count in zip(self.buckets, state):
+        samples.append((self.name + '_bucket', bucket_labelnames, labels + (bound,), count))
+      samples.append((self.name + '_bucket', bucket_labelnames, labels + ('+Inf',), state[-1]))
+      samples.append((self.name + '_sum', self.labelnames, labels, state[-2]))
+      samples.append((self.name + '_count', self.labelnames, labels, state[-1]))
+    return samples
+
+
+def process_alive(pid):
+  try:
+    os.kill(pid, 0)
+  except ProcessLookupError:
+    return False
+  except PermissionError:
+    pass
+  return True
+
+
+class Registry:
+
+  def __init__(self):
+    self.metrics = []
+    self.directory = None
+    self.flush_interval = 1.0
+    self.flusher_pid = None
+
+  def register(self, metric):
+    self.metrics.append(metric)
+    return metric
+
+  def counter(self, *args, **kwargs):
+    return self.register(Counter(*args, **kwargs))
+
+  def gauge(self, *args, **kwargs):
+    return self.register(Gauge(*args, **kwargs))
+
+  def histogram(self, *args, **kwargs):
+    return self.register(Histogram(*args, **kwargs))
+
+  def collect(self):
+    """Values of this process: metric name -> {labels: value}."""
+    return {metric.name: metric.collect() for metric in self.metrics}
+
+  def enable_multiprocess(self, directory, flush_interval=1.0):
+    os.makedirs(directory, exist_ok=True)
+    self.directory = directory
+    self.flush_interval = flush_interval
+
+  def snapshot_path(self, pid):
+    return os.path.join(self.directory, f'{pid}.json')
+
+  def flush(self):
+    """Write this process's values to its snapshot file."""
+    pid = os.getpid()
+    snapshot = {
+        name: [[list(labels), value] for labels, value in values.items()]
+        for name, values in self.collect().items()
+    }
+    path = self.snapshot_path(pid)
+    temporary = f'{path}.{threading.get_ident()}.tmp'
+    with open(temporary, 'w') as out:
+      json.dump(snapshot, out)
+    os.replace(temporary, path)
+
+  def start_flusher(self):
+    """Start the snapshot thread once per process (again in each forked worker)."""
+    if self.directory is None or self.flusher_pid == os.getpid():
+      return
+    self.flusher_pid = os.getpid()
+
+    def run():
+      while True:
+        time.sleep(self.flush_interval)
+        self.flush()
+
+    threading.Thread(target=run, name='metrics-flusher', daemon=True).start()
+    atexit.register(self.flush)
+
+  def aggregate(self, values):
+    """Add the snapshots of other processes to ``values``."""
+    metrics = {metric.name: metric for metric in self.metrics}
+    own = self.snapshot_path(os.getpid())
+    for path in glob.glob(os.path.join(self.directory, '*.json')):
+      if path == own:
+        continue
+      try:
+        with open(path) as f:
+          snapshot = json.load(f)
+      except (OSError, ValueError):
+        continue
+      alive = process_alive(int(os.path.basename(path)[:-len('.json')]))
+      for name, items in snapshot.items():
+        metric = metrics.get(name)
+        if metric is None or (metric.kind == 'gauge' and not alive):
+          continue
+        totals = values.setdefault(name, {})
+        for labels, value in items:
+          labels = tuple(labels)
+          totals[labels] = metric.merge(totals[labels], value) if labels in totals else value
+    return values
+
+  def render(self):
+    values = self.collect()
+    if self.directory is not None:
+      values = self.aggregate(values)
+    lines = []
+    for metric in self.metrics:
+      lines.extend(metric.header())
+      for name, labelnames, labels, value in metric.samples(values.get(metric.name, {})):
+        lines.append(f'{name}{format_labels(labelnames, labels)} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+#----------------------------------------------------------------------------#
+# Connection pool.
+#----------------------------------------------------------------------------#
+
+pool_checkout_wait = registry.histogram(
+    'db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled connection.',
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+)
+pool_overflow_checkouts = registry.counter(
+    'db_pool_overflow_checkouts_total', 'Checkouts served by an overflow connection.'
+)
+pool_timeouts = registry.counter(
+    'db_pool_timeouts_total', 'Checkouts that gave up after pool_timeout.'
+)
+
+
+class InstrumentedQueuePool(QueuePool):
+  """QueuePool that records checkout wait time, overflow use and timeouts."""
+
+  def _do_get(self):
+    start = time.perf_counter()
+    try:
+      connection = super()._do_get()
+    except PoolTimeoutError:
+      pool_timeouts.inc()
+      raise
+    finally:
+      pool_checkout_wait.observe(time.perf_counter() - start)
+    if self.checkedout() > self.size():
+      pool_overflow_checkouts.inc()
+    return connection
+
+
+def register_pool_gauges(get_pool):
+  """Expose size, checked-out and overflow counts of the pool from ``get_pool()``."""
+  for name, documentation, read in (
+      ('db_pool_size', 'Configured pool size.', lambda pool: pool.size()),
+      ('db_pool_checked_out', 'Connections currently checked out.', lambda pool: pool.checkedout()),
+      ('db_pool_overflow', 'Overflow connections currently open.', lambda pool: max(pool.overflow(), 0)),
+  ):
+    registry.gauge(name, documentation, callback=lambda read=read: pool_stat(get_pool, read))
+
+
+def pool_stat(get_pool, read):
+  pool = get_pool()
+  return read(pool) if isinstance(pool, QueuePool) else 0
+
+
+#----------------------------------------------------------------------------#
+# Requests.
+#----------------------------------------------------------------------------#
+
+http_requests = registry.counter(
+    'http_requests_total', 'Requests handled, by route, method and status code.',
+    ('route', 'method', 'status')
+)
+http_request_duration = registry.histogram(
+    'http_request_duration_seconds', 'Request latency by route.', ('route',)
+)
+http_request_db_time = registry.histogram(
+    'http_request_db_seconds', 'Time spent executing SQL per request, by route.', ('route',)
+)
+http_request_template_time = registry.histogram(
+    'http_request_template_seconds',
+    'Time spent rendering templates per request, by route (includes lazy loads they trigger).',
+    ('route',)
+)
+cache_requests = registry.counter(
+    'cache_requests_total', 'Cache lookups by cache and result (hit, miss, bypass).',
+    ('cache', 'result')
+)
+
+
+class TimedTemplate(jinja2.Template):
+  """Template that adds its render time to ``g.template_time``."""
+
+  def render(self, *args, **kwargs):
+    start = time.perf_counter()
+    try:
+      return super().render(*args, **kwargs)
+    finally:
+      if has_app_context():
+        g.template_time = g.get('template_time', 0.0) + time.perf_counter() - start
+
+
+def init_app(app):
+  """Record request metrics; DB time comes from query_stats via ``g.db_time``."""
+  app.jinja_env.template_class = TimedTemplate
+  if app.config.get('METRICS_MULTIPROC_DIR'):
+    registry.enable_multiprocess(
+        app.config['METRICS_MULTIPROC_DIR'], app.config.get('METRICS_FLUSH_INTERVAL', 1.0)
+    )
+
+  @app.before_request
+  def start_request_metrics():
+    registry.start_flusher()
+    g.metrics_start = time.perf_counter()
+    g.template_time = 0.0
+
+  @app.after_request
+  def record_request_metrics(response):
+    if 'metrics_start' not in g:
+      return response
+    # Unmatched URLs share one label so stray paths cannot blow up cardinality.
+    route = request.endpoint or 'unmatched'
+    http_requests.inc(route, request.method, response.status_code)
+    http_request_duration.observe(time.perf_counter() - g.metrics_start, route)
+    http_request_db_time.observe(g.get('db_time', 0.0), route)
+    http_request_template_time.observe(g.template_time, route)
+    return response
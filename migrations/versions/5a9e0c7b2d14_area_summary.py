@@ -0,0 +1,53 @@
+"""area summary table
+
+Revision ID: 5a9e0c7b2d14
+Revises: c41f7d2a9b83
+Create Date: 2026-10-17 19:52:31.204117
+
+"""
+from itertools import groupby
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a9e0c7b2d14'
+down_revision = 'c41f7d2a9b83'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    area_summary = op.create_table('area_summary',
+    sa.Column('state', sa.String(length=120), nullable=False),
+    sa.Column('city', sa.String(length=120), nullable=False),
+    sa.Column('venues_count', sa.Integer(), nullable=False),
+    sa.Column('upcoming_shows_count', sa.Integer(), nullable=False),
+    sa.Column('venues', sa.JSON(), nullable=False),
+    sa.PrimaryKeyConstraint('state', 'city')
+    )
+    op.create_index('ix_Venue_state_city', 'Venue', ['state', 'city'], unique=False)
+
+    # Backfill; same layout as refresh_areas().
+    rows = op.get_bind().execute(sa.text(
+        'SELECT state, city, id, name, upcoming_shows_count FROM "Venue" '
+        'WHERE state IS NOT NULL AND city IS NOT NULL ORDER BY state, city, id'
+    ))
+    summaries = []
+    for (state, city), venues in groupby(rows, key=lambda row: (row[0], row[1])):
+        venues = [[venue_id, name, upcoming_count] for _, _, venue_id, name, upcoming_count in venues]
+        summaries.append({
+            'state': state,
+            'city': city,
+            'venues_count': len(venues),
+            'upcoming_shows_count': sum(venue[2] for venue in venues),
+            'venues': venues,
+        })
+    if summaries:
+        op.bulk_insert(area_summary, summaries)
+
+
+def downgrade():
+    op.drop_index('ix_Venue_state_city', table_name='Venue')
+    op.drop_table('area_summary')
@@ -0,0 +1,48 @@
+"""name search indexes only
+
+Revision ID: 7c2e4f9a1d35
+Revises: 9f3b6d1e7a20
+Create Date: 2026-10-17 23:05:47.218390
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2e4f9a1d35'
+down_revision = '9f3b6d1e7a20'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist')
+
+
+def upgrade():
+    # Only the name is searched with ILIKE; city and state filters are
+    # equality lookups served by ix_*_state_city, so their trigram indexes
+    # were never used. Backends without pg_trgm get a plain name index
+    # under the name the models declare.
+    if op.get_bind().dialect.name == 'postgresql':
+        for table in TABLES:
+            op.drop_index(f'ix_{table}_state_trgm', table_name=table)
+            op.drop_index(f'ix_{table}_city_trgm', table_name=table)
+        return
+
+    for table in TABLES:
+        op.create_index(f'ix_{table}_name_trgm', table, ['name'], unique=False)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for table in reversed(TABLES):
+            for column in ('city', 'state'):
+                op.create_index(
+                    f'ix_{table}_{column}_trgm', table, [column],
+                    postgresql_using='gin',
+                    postgresql_ops={column: 'gin_trgm_ops'}
+                )
+        return
+
+    for table in reversed(TABLES):
+        op.drop_index(f'ix_{table}_name_trgm', table_name=table)
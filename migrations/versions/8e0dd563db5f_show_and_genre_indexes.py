@@ -0,0 +1,68 @@
+"""show and genre indexes
+
+Revision ID: 8e0dd563db5f
+Revises: b3d3e3edc0b3
+Create Date: 2026-10-17 11:40:08.118270
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e0dd563db5f'
+down_revision = 'b3d3e3edc0b3'
+branch_labels = None
+depends_on = None
+
+KEEP_GENRE_IDS = 'SELECT MIN(id) FROM "Genre" WHERE name IS NOT NULL GROUP BY name'
+
+
+def merge_duplicate_genres():
+    # Genre.name was never unique, so concurrent form posts may have created
+    # duplicates. Point every association at the lowest id per name, then
+    # drop the extra rows so the unique index can be built.
+    for table, key in (('artist_genre_table', 'artist_id'), ('venue_genre_table', 'venue_id')):
+        op.execute(f'''
+            INSERT INTO {table} (genre_id, {key})
+            SELECT DISTINCT keep.id, t.{key}
+            FROM {table} t
+            JOIN "Genre" g ON g.id = t.genre_id
+            JOIN (SELECT name, MIN(id) AS id FROM "Genre" GROUP BY name) keep
+              ON keep.name = g.name
+            WHERE t.genre_id <> keep.id
+              AND NOT EXISTS (
+                SELECT 1 FROM {table} t2
+                WHERE t2.{key} = t.{key} AND t2.genre_id = keep.id
+              )
+        ''')
+        op.execute(f'''
+            DELETE FROM {table}
+            WHERE genre_id IN (
+              SELECT id FROM "Genre"
+              WHERE name IS NOT NULL AND id NOT IN ({KEEP_GENRE_IDS})
+            )
+        ''')
+    op.execute(f'''
+        DELETE FROM "Genre"
+        WHERE name IS NOT NULL AND id NOT IN ({KEEP_GENRE_IDS})
+    ''')
+
+
+def upgrade():
+    merge_duplicate_genres()
+    op.create_index(op.f('ix_Genre_name'), 'Genre', ['name'], unique=True)
+    op.create_index('ix_Show_venue_id_starting_time', 'Show', ['venue_id', 'starting_time'], unique=False)
+    op.create_index('ix_Show_artist_id_starting_time', 'Show', ['artist_id', 'starting_time'], unique=False)
+    op.create_index('ix_Show_starting_time_id', 'Show', ['starting_time', 'id'], unique=False)
+    op.create_index('ix_artist_genre_table_artist_id', 'artist_genre_table', ['artist_id'], unique=False)
+    op.create_index('ix_venue_genre_table_venue_id', 'venue_genre_table', ['venue_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_venue_genre_table_venue_id', table_name='venue_genre_table')
+    op.drop_index('ix_artist_genre_table_artist_id', table_name='artist_genre_table')
+    op.drop_index('ix_Show_starting_time_id', table_name='Show')
+    op.drop_index('ix_Show_artist_id_starting_time', table_name='Show')
+    op.drop_index('ix_Show_venue_id_starting_time', table_name='Show')
+    op.drop_index(op.f('ix_Genre_name'), table_name='Genre')
@@ -0,0 +1,24 @@
+"""artist state/city index
+
+Revision ID: 9f3b6d1e7a20
+Revises: 5a9e0c7b2d14
+Create Date: 2026-10-17 20:41:08.553716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9f3b6d1e7a20'
+down_revision = '5a9e0c7b2d14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_Artist_state_city', 'Artist', ['state', 'city'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Artist_state_city', table_name='Artist')
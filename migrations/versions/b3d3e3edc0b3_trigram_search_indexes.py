@@ -0,0 +1,43 @@
+"""trigram search indexes
+
+Revision ID: b3d3e3edc0b3
+Revises: e4b8ae6045a5
+Create Date: 2026-10-17 10:12:31.402118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3d3e3edc0b3'
+down_revision = 'e4b8ae6045a5'
+branch_labels = None
+depends_on = None
+
+SEARCH_COLUMNS = ('name', 'city', 'state')
+
+
+def upgrade():
+    # pg_trgm GIN indexes let ILIKE '%term%' and similarity() use an index
+    # instead of a sequential scan. Other backends keep the plain scan.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in ('Venue', 'Artist'):
+        for column in SEARCH_COLUMNS:
+            op.create_index(
+                f'ix_{table}_{column}_trgm', table, [column],
+                postgresql_using='gin',
+                postgresql_ops={column: 'gin_trgm_ops'}
+            )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for table in ('Artist', 'Venue'):
+        for column in reversed(SEARCH_COLUMNS):
+            op.drop_index(f'ix_{table}_{column}_trgm', table_name=table)
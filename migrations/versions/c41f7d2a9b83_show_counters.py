@@ -0,0 +1,45 @@
+"""show counters on venue and artist
+
+Revision ID: c41f7d2a9b83
+Revises: 06520531d9ac
+Create Date: 2026-10-17 18:40:12.517304
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41f7d2a9b83'
+down_revision = '06520531d9ac'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table, key in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('next_show_at', sa.DateTime(), nullable=True))
+        op.create_index(op.f(f'ix_{table}_next_show_at'), table, ['next_show_at'], unique=False)
+
+        # Backfill from Show; same definitions as refresh_show_counters().
+        op.get_bind().execute(sa.text(f'''
+            UPDATE "{table}" SET
+              upcoming_shows_count = (SELECT count(*) FROM "Show"
+                                      WHERE "Show".{key} = "{table}".id AND "Show".starting_time > :now),
+              past_shows_count = (SELECT count(*) FROM "Show"
+                                  WHERE "Show".{key} = "{table}".id AND "Show".starting_time <= :now),
+              next_show_at = (SELECT min("Show".starting_time) FROM "Show"
+                              WHERE "Show".{key} = "{table}".id AND "Show".starting_time > :now)
+        '''), {"now": datetime.now()})
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        op.drop_index(op.f(f'ix_{table}_next_show_at'), table_name=table)
+        op.drop_column(table, 'next_show_at')
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
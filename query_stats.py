@@ -0,0 +1,131 @@
+#----------------------------------------------------------------------------#
+# Per-request SQL statistics.
+#
+# Cursor events on every Engine count statements and DB time into flask.g.
+# After each request the totals go out as a Server-Timing header and as
+# fields on a log record; statements slower than SLOW_QUERY_THRESHOLD_MS
+# are logged with their EXPLAIN plan.
+#----------------------------------------------------------------------------#
+
+import logging
+import time
+from contextlib import contextmanager
+
+from flask import g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+request_logger = logging.getLogger('fyyur.requests')
+slow_query_logger = logging.getLogger('fyyur.slow_queries')
+
+# Statement lists collected by count_queries(); innermost last.
+_recorders = []
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+  conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+  elapsed = time.perf_counter() - conn.info['query_start'].pop()
+
+  for recorder in _recorders:
+    recorder.append(statement)
+
+  if not has_app_context():
+    return
+  g.db_statements = g.get('db_statements', 0) + 1
+  g.db_time = g.get('db_time', 0.0) + elapsed
+
+  threshold = g.get('slow_query_threshold')
+  if threshold is not None and elapsed * 1000 >= threshold:
+    log_slow_query(conn, cursor, statement, parameters, elapsed, executemany)
+
+
+def explain(conn, statement, parameters):
+  """EXPLAIN plan for a SELECT, run on a raw cursor so no events fire."""
+  if not statement.lstrip().upper().startswith('SELECT'):
+    return None
+  prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+  cursor = conn.connection.cursor()
+  try:
+    cursor.execute(prefix + statement, parameters)
+    return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+  except Exception as e:
+    return f'EXPLAIN failed: {e}'
+  finally:
+    cursor.close()
+
+
+def log_slow_query(conn, cursor, statement, parameters, elapsed, executemany):
+  plan = None if executemany else explain(conn, statement, parameters)
+  slow_query_logger.warning(
+      'slow query (%.1f ms): %s', elapsed * 1000, statement,
+      extra={
+          'duration_ms': round(elapsed * 1000, 3),
+          'statement': statement,
+          'parameters': repr(parameters)[:1000],
+          'plan': plan,
+          'route': request.endpoint if request else None,
+      }
+  )
+
+
+def init_app(app):
+  event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+  event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+  @app.before_request
+  def start_query_stats():
+    g.request_start = time.perf_counter()
+    g.db_statements = 0
+    g.db_time = 0.0
+    g.slow_query_threshold = app.config.get('SLOW_QUERY_THRESHOLD_MS')
+
+  @app.after_request
+  def report_query_stats(response):
+    if 'request_start' not in g:
+      return response
+    total = time.perf_counter() - g.request_start
+    response.headers.add(
+        'Server-Timing',
+        f'db;dur={g.db_time * 1000:.2f};desc="{g.db_statements} queries", total;dur={total * 1000:.2f}'
+    )
+    request_logger.info(
+        '%s %s %s', request.method, request.path, response.status_code,
+        extra={
+            'route': request.endpoint,
+            'status': response.status_code,
+            'duration_ms': round(total * 1000, 3),
+            'db_statements': g.db_statements,
+            'db_time_ms': round(g.db_time * 1000, 3),
+        }
+    )
+    return response
+
+
+@contextmanager
+def count_queries():
+  """Collect the SQL statements executed inside the block.
+
+      with count_queries() as statements:
+          client.get('/venues')
+      assert len(statements) == 1
+  """
+  statements = []
+  _recorders.append(statements)
+  try:
+    yield statements
+  finally:
+    _recorders.remove(statements)
+
+
+@contextmanager
+def assert_max_queries(limit):
+  """Fail if the block runs more than ``limit`` SQL statements."""
+  with count_queries() as statements:
+    yield statements
+  if len(statements) > limit:
+    raise AssertionError(
+        f'{len(statements)} queries executed, at most {limit} allowed:\n' + '\n'.join(statements)
+    )
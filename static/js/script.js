@@ -2,3 +2,37 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// Name inputs marked data-autocomplete="artist|venue" fill their datalist
+// from /api/autocomplete and copy the picked suggestion's ID into the
+// field named by data-target.
+document.addEventListener('DOMContentLoaded', function () {
+  var inputs = document.querySelectorAll('input[data-autocomplete]');
+  Array.prototype.forEach.call(inputs, function (input) {
+    var list = document.getElementById(input.getAttribute('list'));
+    var target = document.getElementById(input.dataset.target);
+    var pending = null;
+
+    input.addEventListener('input', function () {
+      var match = /\(#(\d+)\)$/.exec(input.value);
+      if (match) {
+        target.value = match[1];
+        return;
+      }
+      clearTimeout(pending);
+      pending = setTimeout(function () {
+        var url = '/api/autocomplete?type=' + input.dataset.autocomplete + '&q=' + encodeURIComponent(input.value);
+        fetch(url).then(function (response) {
+          return response.json();
+        }).then(function (suggestions) {
+          list.innerHTML = '';
+          suggestions.forEach(function (suggestion) {
+            var option = document.createElement('option');
+            option.value = suggestion.name + ' (#' + suggestion.id + ')';
+            list.appendChild(option);
+          });
+        });
+      }, 100);
+    });
+  });
+});
@@ -0,0 +1,66 @@
+#----------------------------------------------------------------------------#
+# Shared fixtures.
+#
+#   python -m pytest tests
+#
+# app.py is configured at import time, so one app serves the whole run. It
+# uses a throwaway SQLite file filled by benchmarks.datagen, or
+# TEST_DATABASE_URL when set (its contents are replaced; never point it at
+# data you want to keep).
+#----------------------------------------------------------------------------#
+
+import os
+
+import pytest
+
+DATABASE_URL = os.environ.get('TEST_DATABASE_URL') or None
+
+
+@pytest.fixture(scope='session')
+def fyyur():
+  from benchmarks import datagen, load_app
+
+  fyyur = load_app(DATABASE_URL)
+  with fyyur.app.app_context():
+    datagen.generate(fyyur, venues=60, artists=60, shows=600)
+  return fyyur
+
+
+@pytest.fixture
+def app_context(fyyur):
+  with fyyur.app.app_context():
+    yield
+    fyyur.db.session.rollback()
+
+
+@pytest.fixture
+def client(fyyur):
+  return fyyur.app.test_client()
+
+
+@pytest.fixture
+def csrf(client):
+  """CSRF token for ``client``'s session."""
+  from benchmarks.run import csrf_token
+  return csrf_token(client)
+
+
+@pytest.fixture
+def make_party(fyyur):
+  """Factory adding a venue and an artist without shows; returns their ids."""
+
+  def make(name='Test'):
+    with fyyur.app.app_context():
+      venue = fyyur.Venue(name=f'{name} Venue', city='Testville', state='TX', phone='5125550100')
+      artist = fyyur.Artist(name=f'{name} Artist', city='Testville', state='TX', phone='5125550100')
+      fyyur.db.session.add_all([venue, artist])
+      fyyur.db.session.commit()
+      return venue.id, artist.id
+
+  return make
+
+
+@pytest.fixture
+def party(make_party):
+  """``(venue_id, artist_id)`` of a new venue and artist."""
+  return make_party()
@@ -0,0 +1,58 @@
+#----------------------------------------------------------------------------#
+# /api/autocomplete: updates from writes and reloads on version changes.
+#----------------------------------------------------------------------------#
+
+from benchmarks.run import venue_form
+
+
+def suggest(client, kind, q):
+  response = client.get('/api/autocomplete', query_string={"type": kind, "q": q})
+  assert response.status_code == 200
+  return response.get_json()
+
+
+def test_venue_add_rename_remove(client, csrf):
+  suggest(client, 'venue', 'x')  # load the index
+
+  form = dict(venue_form(0), name='Zanzibar Autotest Hall', csrf_token=csrf)
+  assert client.post('/venues/create', data=form).status_code == 302
+  [found] = suggest(client, 'venue', 'zanzibar auto')
+  assert found["name"] == 'Zanzibar Autotest Hall'
+  assert suggest(client, 'venue', 'autotest') == [found]
+
+  form["name"] = 'Quokka Autotest Hall'
+  assert client.post(f'/venues/{found["id"]}/edit', data=form).status_code == 302
+  assert suggest(client, 'venue', 'zanzibar') == []
+  assert suggest(client, 'venue', 'quokka') == [{"id": found["id"], "name": 'Quokka Autotest Hall'}]
+
+  assert client.delete(f'/venues/{found["id"]}').status_code == 200
+  assert suggest(client, 'venue', 'quokka') == []
+
+
+def test_reload_follows_the_name_version(fyyur, client):
+  suggest(client, 'artist', 'x')  # load the index
+
+  with fyyur.app.app_context():
+    # Another worker's write: this process's index only sees it on reload.
+    fyyur.db.session.add(fyyur.Artist(name='Wombat Autotest Trio', city='Testville', state='TX'))
+    fyyur.bump_cache_version('artists')
+    fyyur.db.session.commit()
+    fyyur.autocomplete.refresh()
+  assert suggest(client, 'artist', 'wombat') == []
+
+  with fyyur.app.app_context():
+    fyyur.bump_cache_version('artist_names')
+    fyyur.db.session.commit()
+    fyyur.autocomplete.refresh()
+  assert [row["name"] for row in suggest(client, 'artist', 'wombat')] == ['Wombat Autotest Trio']
+
+
+def test_prefix_of_any_word_and_limit(client):
+  rows = suggest(client, 'artist', 'the')
+  assert 0 < len(rows) <= 10
+  assert all(any(word.startswith('the') for word in row["name"].casefold().split()) for row in rows)
+  assert len(client.get('/api/autocomplete?type=artist&q=the&limit=2').get_json()) == 2
+
+
+def test_unknown_type(client):
+  assert client.get('/api/autocomplete?type=show&q=a').status_code == 400
@@ -0,0 +1,37 @@
+#----------------------------------------------------------------------------#
+# cache_version counters.
+#----------------------------------------------------------------------------#
+
+
+def test_bump_cache_version_applies_once_per_commit(fyyur, app_context):
+  assert fyyur.current_cache_version('test_cache') == 0
+  fyyur.bump_cache_version('test_cache')
+  fyyur.bump_cache_version('test_cache')
+  # Nothing is written before the commit.
+  assert fyyur.current_cache_version('test_cache') == 0
+  fyyur.db.session.commit()
+  assert fyyur.current_cache_version('test_cache') == 1
+
+  fyyur.bump_cache_version('test_cache')
+  fyyur.db.session.commit()
+  assert fyyur.current_cache_version('test_cache') == 2
+
+
+def test_rolled_back_bump_is_dropped(fyyur, app_context):
+  fyyur.bump_cache_version('test_rollback')
+  fyyur.db.session.rollback()
+  fyyur.db.session.commit()
+  assert fyyur.current_cache_version('test_rollback') == 0
+
+
+def test_bump_is_written_after_the_change(fyyur, app_context):
+  statements = []
+  with fyyur.query_stats.count_queries() as statements:
+    venue = fyyur.Venue.query.first()
+    venue.name = venue.name
+    venue.phone = '5125550199'
+    fyyur.bump_cache_version('venues')
+    fyyur.db.session.commit()
+
+  assert 'UPDATE "Venue"' in statements[-2]
+  assert 'cache_version' in statements[-1]
@@ -0,0 +1,34 @@
+#----------------------------------------------------------------------------#
+# resolve_genres: existing and new genre names.
+#----------------------------------------------------------------------------#
+
+
+def genre_count(fyyur, name):
+  return fyyur.Genre.query.filter_by(name=name).count()
+
+
+def test_resolve_genres_keeps_input_order(fyyur, app_context):
+  genres = fyyur.resolve_genres(['Test Genre B', 'Jazz', 'Test Genre A', 'Jazz', 'Blues'])
+  fyyur.db.session.commit()
+
+  assert [genre.name for genre in genres] == ['Test Genre B', 'Jazz', 'Test Genre A', 'Blues']
+  assert all(genre.id for genre in genres)
+  assert genre_count(fyyur, 'Test Genre A') == 1
+  assert genre_count(fyyur, 'Test Genre B') == 1
+
+
+def test_resolve_genres_again_inserts_no_duplicates(fyyur, app_context):
+  first = fyyur.resolve_genres(['Test Genre C', 'Blues'])
+  fyyur.db.session.commit()
+  total = fyyur.Genre.query.count()
+
+  second = fyyur.resolve_genres(['Blues', 'Test Genre C'])
+  fyyur.db.session.commit()
+
+  assert [genre.id for genre in second] == [first[1].id, first[0].id]
+  assert fyyur.Genre.query.count() == total
+  assert genre_count(fyyur, 'Test Genre C') == 1
+
+
+def test_resolve_genres_of_nothing(fyyur, app_context):
+  assert fyyur.resolve_genres([]) == []
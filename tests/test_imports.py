@@ -0,0 +1,81 @@
+#----------------------------------------------------------------------------#
+# Bulk import: rejects and batch sizes.
+#----------------------------------------------------------------------------#
+
+import io
+import json
+
+
+def venue_row(name, **changes):
+  row = {"name": name, "city": 'Importville', "state": 'TX', "address": '1 Import Street',
+         "genres": ['Jazz'], "seeking_talent": False}
+  row.update(changes)
+  return row
+
+
+def ndjson(*rows):
+  return ''.join((row if isinstance(row, str) else json.dumps(row)) + '\n' for row in rows)
+
+
+def upload(client, csrf, kind, text, query=''):
+  return client.post(f'/import/{kind}{query}', data={
+      "file": (io.BytesIO(text.encode()), f'{kind}.ndjson'), "csrf_token": csrf
+  })
+
+
+def test_upload_imports_good_rows_and_reports_rejects(fyyur, client, csrf):
+  text = ndjson(
+      venue_row('Import Good 1'),
+      venue_row('Import No City', city=''),
+      '{not json',
+      venue_row('Import Good 2'),
+      venue_row('Import Good 3'),
+  )
+  response = upload(client, csrf, 'venues', text, '?batch_size=2')
+
+  assert response.status_code == 200
+  result = response.get_json()
+  assert result["imported"] == 3
+  assert result["rejected"] == 2
+  assert [reject["line"] for reject in result["rejects"]] == [2, 3]
+  assert list(result["rejects"][0]["errors"]) == ['city']
+
+  with fyyur.app.app_context():
+    names = {name for name, in fyyur.db.session.query(fyyur.Venue.name).filter(fyyur.Venue.city == 'Importville')}
+  assert {'Import Good 1', 'Import Good 2', 'Import Good 3'} <= names
+  assert 'Import No City' not in names
+
+
+def test_upload_rejects_batch_size_below_one(client, csrf):
+  for batch_size in ('0', '-1'):
+    response = upload(client, csrf, 'venues', ndjson(venue_row('Import Never')), f'?batch_size={batch_size}')
+    assert response.status_code == 400
+    assert response.get_json() == {"error": 'batch_size must be at least 1'}
+
+
+def test_upload_unknown_kind(client, csrf):
+  assert upload(client, csrf, 'genres', ndjson({})).status_code == 400
+
+
+def test_cli_import_writes_rejects(fyyur, tmp_path):
+  path = tmp_path / 'artists.ndjson'
+  path.write_text(ndjson(
+      dict(venue_row('Cli Artist 1'), seeking_venue=True),
+      dict(venue_row('Cli Artist 2', state='XX')),
+  ))
+
+  result = fyyur.app.test_cli_runner().invoke(args=['import', 'artists', str(path), '--batch-size', '1'])
+  assert result.exit_code == 0, result.output
+  assert 'Imported 1 artists, rejected 1' in result.output
+
+  rejects = [json.loads(line) for line in (tmp_path / 'artists.ndjson.rejects.ndjson').read_text().splitlines()]
+  assert [(reject["line"], list(reject["errors"])) for reject in rejects] == [(2, ['state'])]
+
+
+def test_cli_rejects_batch_size_below_one(fyyur, tmp_path):
+  path = tmp_path / 'venues.ndjson'
+  path.write_text(ndjson(venue_row('Cli Never')))
+
+  result = fyyur.app.test_cli_runner().invoke(args=['import', 'venues', str(path), '--batch-size', '0'])
+  assert result.exit_code == 2
+  assert "Invalid value for '--batch-size'" in result.output
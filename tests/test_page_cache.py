@@ -0,0 +1,77 @@
+#----------------------------------------------------------------------------#
+# Page cache: hits, and invalidation by the writes that change a page.
+#----------------------------------------------------------------------------#
+
+import pytest
+
+from benchmarks.run import venue_form
+from cache import LRUBackend, NullBackend
+
+
+@pytest.fixture
+def page_cache(fyyur):
+  fyyur.page_cache.backend = LRUBackend()
+  yield fyyur.page_cache
+  fyyur.page_cache.backend = NullBackend()
+
+
+@pytest.fixture
+def reader(fyyur):
+  """A second visitor, whose requests carry no flashed messages."""
+  return fyyur.app.test_client()
+
+
+def get(fyyur, client, url):
+  with fyyur.query_stats.count_queries() as statements:
+    response = client.get(url)
+  assert response.status_code == 200
+  return response.get_data(as_text=True), len(statements)
+
+
+def test_repeated_page_is_served_from_cache(fyyur, page_cache, reader):
+  first, _ = get(fyyur, reader, '/venues')
+  again, queries = get(fyyur, reader, '/venues')
+  assert again == first
+  assert queries == 0
+
+
+def test_new_venue_invalidates_venues_page(fyyur, page_cache, reader, client, csrf):
+  get(fyyur, reader, '/venues')
+  form = dict(venue_form(0), name='Cache Test Venue', csrf_token=csrf)
+  assert client.post('/venues/create', data=form).status_code == 302
+
+  page, queries = get(fyyur, reader, '/venues')
+  assert queries > 0
+  assert 'Cache Test Venue' in page
+
+
+def test_edit_invalidates_only_tagged_pages(fyyur, page_cache, reader, client, csrf, party):
+  venue_id, artist_id = party
+  get(fyyur, reader, f'/venues/{venue_id}')
+  get(fyyur, reader, f'/artists/{artist_id}')
+
+  form = dict(venue_form(0), name='Renamed Cache Venue', csrf_token=csrf)
+  assert client.post(f'/venues/{venue_id}/edit', data=form).status_code == 302
+
+  page, queries = get(fyyur, reader, f'/venues/{venue_id}')
+  assert queries > 0
+  assert 'Renamed Cache Venue' in page
+  # The artist page has no show at this venue, so it is still cached.
+  _, queries = get(fyyur, reader, f'/artists/{artist_id}')
+  assert queries == 0
+
+
+def test_new_show_invalidates_both_parties(fyyur, page_cache, reader, client, party):
+  venue_id, artist_id = party
+  get(fyyur, reader, f'/venues/{venue_id}')
+  get(fyyur, reader, f'/artists/{artist_id}')
+
+  response = client.post('/api/v1/shows', json={"shows": [
+      {"venue_id": venue_id, "artist_id": artist_id, "starting_time": '2031-05-01T20:00:00'}
+  ]})
+  assert response.get_json()["scheduled"] == 1
+
+  for url in (f'/venues/{venue_id}', f'/artists/{artist_id}'):
+    page, queries = get(fyyur, reader, url)
+    assert queries > 0
+    assert '2031' in page
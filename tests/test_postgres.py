@@ -0,0 +1,50 @@
+#----------------------------------------------------------------------------#
+# Checks of the Postgres-only code paths.
+#
+#   TEST_DATABASE_URL=postgresql://localhost/fyyur_test python -m pytest tests
+#
+# Skipped unless the run uses Postgres (see conftest.py).
+#----------------------------------------------------------------------------#
+
+import pytest
+
+from conftest import DATABASE_URL
+
+pytestmark = pytest.mark.skipif(
+    not (DATABASE_URL or '').startswith('postgresql'), reason='TEST_DATABASE_URL does not point at Postgres'
+)
+
+
+def drop_genre(fyyur, name):
+  """Delete one genre and its links, so the next post has to create it."""
+  db, Genre = fyyur.db, fyyur.Genre
+  genre_id = db.session.query(Genre.id).filter(Genre.name == name).scalar()
+  for table in (fyyur.venue_genre_table, fyyur.artist_genre_table):
+    db.session.execute(table.delete().where(table.c.genre_id == genre_id))
+  Genre.query.filter(Genre.id == genre_id).delete()
+  db.session.commit()
+
+
+def test_resolve_genres_inserts_missing_genres(fyyur, app_context):
+  drop_genre(fyyur, 'Jazz')
+  genres = fyyur.resolve_genres(['Blues', 'Jazz', 'Blues'])
+  fyyur.db.session.commit()
+
+  assert [genre.name for genre in genres] == ['Blues', 'Jazz']
+  assert all(genre.id for genre in genres)
+  assert fyyur.Genre.query.filter_by(name='Jazz').count() == 1
+
+
+def test_create_venue_with_new_genre(fyyur, client, csrf):
+  from benchmarks.run import venue_form
+
+  with fyyur.app.app_context():
+    drop_genre(fyyur, 'Folk')
+
+  form = dict(venue_form(0), name='Postgres Genre Venue', genres=['Folk'], csrf_token=csrf)
+  response = client.post('/venues/create', data=form)
+  assert response.status_code == 302
+
+  with fyyur.app.app_context():
+    venue = fyyur.Venue.query.filter_by(name='Postgres Genre Venue').one()
+    assert [genre.name for genre in venue.genres] == ['Folk']
@@ -0,0 +1,61 @@
+#----------------------------------------------------------------------------#
+# SQL statement budgets of the read routes.
+#
+# Each request runs under query_stats.assert_max_queries, against the
+# requests benchmarks/run.py measures (busiest venue and artist). Counts do
+# not depend on the machine, unlike the benchmark's latency comparison.
+#----------------------------------------------------------------------------#
+
+import pytest
+
+BUDGETS = {
+    'index': 0,
+    'venues': 1,
+    'show_area': 1,
+    # Four facet counts and the results.
+    'venues_search': 5,
+    'venues_search_facets': 5,
+    'show_venue': 5,
+    'show_venue_older': 5,
+    'create_venue_form': 0,
+    'edit_venue_form': 2,
+    'artists': 1,
+    'artists_search': 5,
+    'artists_search_facets': 5,
+    'show_artist': 5,
+    'create_artist_form': 0,
+    'edit_artist_form': 2,
+    'shows': 1,
+    'shows_next_page': 1,
+    'shows_filtered': 1,
+    'create_show_form': 0,
+    'api_venues': 2,
+    'api_artists': 2,
+    'api_shows': 2,
+    'api_venue': 5,
+    'api_artist': 5,
+    'api_show': 1,
+    'autocomplete': 0,
+    'metrics': 0,
+}
+
+
+@pytest.fixture(scope='module')
+def routes(fyyur):
+  from benchmarks.run import build_routes
+
+  with fyyur.app.app_context():
+    return {route.name: route for route in build_routes(fyyur, 1)}
+
+
+@pytest.mark.parametrize('name', sorted(BUDGETS))
+def test_route_budget(fyyur, routes, client, csrf, name):
+  method, url, kwargs = routes[name].request(0)
+  if "data" in kwargs:
+    kwargs["data"]["csrf_token"] = csrf
+
+  # The first request loads the in-process caches (genres, name indexes).
+  getattr(client, method)(url, **kwargs)
+  with fyyur.query_stats.assert_max_queries(BUDGETS[name]):
+    response = getattr(client, method)(url, **kwargs)
+  assert response.status_code == 200
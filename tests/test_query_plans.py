@@ -0,0 +1,55 @@
+#----------------------------------------------------------------------------#
+# Query plans of the show and genre lookups.
+#
+# Pages are requested through the test client and every SELECT they ran is
+# EXPLAINed (benchmarks.micro.page_plans), so the checks follow the queries
+# app.py actually sends.
+#----------------------------------------------------------------------------#
+
+import pytest
+
+from benchmarks.micro import page_plans, plan_problems
+
+PAGES = {
+    'venue': (
+        '/venues/{venue_id}',
+        ['ix_Show_venue_id_starting_time', 'ix_venue_genre_table_venue_id'],
+    ),
+    'venue_older': (
+        '/venues/{venue_id}?before=2100-01-01T00:00:00_0',
+        ['ix_Show_venue_id_starting_time'],
+    ),
+    'artist': (
+        '/artists/{artist_id}',
+        ['ix_Show_artist_id_starting_time', 'ix_artist_genre_table_artist_id'],
+    ),
+    'api_venue': (
+        '/api/v1/venues/{venue_id}',
+        ['ix_Show_venue_id_starting_time', 'ix_venue_genre_table_venue_id'],
+    ),
+    'api_artist': (
+        '/api/v1/artists/{artist_id}',
+        ['ix_Show_artist_id_starting_time', 'ix_artist_genre_table_artist_id'],
+    ),
+    'shows': (
+        '/shows',
+        ['ix_Show_starting_time_id'],
+    ),
+}
+
+
+@pytest.fixture(scope='module')
+def ids(fyyur):
+  Show = fyyur.Show
+  with fyyur.app.app_context():
+    venue_id, artist_id = fyyur.db.session.query(Show.venue_id, Show.artist_id).order_by(Show.id).first()
+  return {"venue_id": venue_id, "artist_id": artist_id}
+
+
+@pytest.mark.parametrize('name', sorted(PAGES))
+def test_page_uses_indexes(fyyur, client, ids, name):
+  page, indexes = PAGES[name]
+  plans = page_plans(fyyur, client, page.format(**ids))
+
+  assert plans
+  assert plan_problems(fyyur.db.engine.dialect.name, indexes, plans) == []
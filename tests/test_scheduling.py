@@ -0,0 +1,88 @@
+#----------------------------------------------------------------------------#
+# Show scheduling: double bookings and starting time parsing.
+#----------------------------------------------------------------------------#
+
+from datetime import datetime, timedelta
+
+import pytest
+
+START = datetime(2031, 3, 1, 20, 0)
+
+
+def schedule(client, *shows):
+  response = client.post('/api/v1/shows', json={"shows": [
+      {"venue_id": venue_id, "artist_id": artist_id, "starting_time": str(starting_time)}
+      for venue_id, artist_id, starting_time in shows
+  ]})
+  assert response.status_code == 200
+  return response.get_json()
+
+
+@pytest.fixture
+def other(make_party):
+  """A second venue and artist, so a row can clash on one side only."""
+  return make_party('Other')
+
+
+def test_overlap_with_booked_show(client, party, other):
+  venue_id, artist_id = party
+  assert schedule(client, (venue_id, artist_id, START.isoformat()))["scheduled"] == 1
+
+  result = schedule(
+      client,
+      (venue_id, other[1], (START + timedelta(minutes=119)).isoformat()),
+      (other[0], artist_id, (START - timedelta(minutes=30)).isoformat()),
+  )
+  assert result["scheduled"] == 0
+  assert [(reject["line"], sorted(reject["errors"])) for reject in result["rejects"]] == [
+      (1, ['venue_id']), (2, ['artist_id'])
+  ]
+
+
+def test_overlap_within_one_request(client, party, other):
+  venue_id, artist_id = party
+  result = schedule(
+      client,
+      (venue_id, artist_id, START.isoformat()),
+      (other[0], artist_id, (START + timedelta(hours=1)).isoformat()),
+  )
+  assert result["scheduled"] == 1
+  assert [(reject["line"], sorted(reject["errors"])) for reject in result["rejects"]] == [(2, ['artist_id'])]
+
+
+def test_shows_exactly_one_duration_apart_do_not_clash(fyyur, client, party):
+  venue_id, artist_id = party
+  duration = timedelta(minutes=fyyur.app.config['SHOW_DURATION_MINUTES'])
+  assert schedule(client, (venue_id, artist_id, START.isoformat()))["scheduled"] == 1
+
+  result = schedule(
+      client,
+      (venue_id, artist_id, (START + duration).isoformat()),
+      (venue_id, artist_id, (START - duration).isoformat()),
+      (venue_id, artist_id, (START + duration - timedelta(minutes=1)).isoformat()),
+  )
+  assert result["scheduled"] == 2
+  assert [reject["line"] for reject in result["rejects"]] == [3]
+
+
+def test_show_conflicts_against_rows_and_table(fyyur, app_context, party):
+  venue_id, artist_id = party
+  fyyur.db.session.add(fyyur.Show(venue_id=venue_id, artist_id=artist_id, starting_time=START))
+  fyyur.db.session.flush()
+
+  conflicts = fyyur.show_conflicts([
+      {"venue_id": venue_id, "artist_id": -1, "starting_time": START + timedelta(minutes=90)},
+      {"venue_id": -1, "artist_id": -2, "starting_time": START + timedelta(days=1)},
+      {"venue_id": -1, "artist_id": -3, "starting_time": START + timedelta(days=1, minutes=10)},
+  ])
+  assert sorted(conflicts) == [0, 2]
+  assert list(conflicts[0]) == ['venue_id']
+  assert list(conflicts[2]) == ['venue_id']
+
+
+@pytest.mark.parametrize('starting_time', ['2031-03-01T20:00:00+02:00', '2031-03-01T20:00:00Z'])
+def test_times_with_utc_offset_are_rejected(client, party, starting_time):
+  venue_id, artist_id = party
+  result = schedule(client, (venue_id, artist_id, starting_time))
+  assert result["scheduled"] == 0
+  assert result["rejects"][0]["errors"] == {"starting_time": ['Give the time without a UTC offset.']}
@@ -0,0 +1,72 @@
+#----------------------------------------------------------------------------#
+# Faceted venue search: totals and per-group facet counts.
+#----------------------------------------------------------------------------#
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+TERM = 'Facetcase'
+
+
+@pytest.fixture(scope='module')
+def venues(fyyur):
+  rows = [
+      ('Facetcase A', 'New York', 'NY', ['Jazz'], True),
+      ('Facetcase B', 'New York', 'NY', ['Jazz', 'Blues'], False),
+      ('Facetcase C', 'Los Angeles', 'CA', ['Blues'], True),
+  ]
+  with fyyur.app.app_context():
+    for name, city, state, genres, seeking in rows:
+      venue = fyyur.Venue(name=name, city=city, state=state, phone='5125550100', seeking_talent=seeking)
+      venue.genres = fyyur.resolve_genres(genres)
+      fyyur.db.session.add(venue)
+    fyyur.db.session.commit()
+
+
+def facets(fyyur, **args):
+  filters = fyyur.search_filters(MultiDict(args))
+  total, facets = fyyur.search_facets('venues', TERM, filters)
+  return total, {group: {label: count for _, label, count in values} for group, values in facets.items()}
+
+
+def test_counts_without_filters(fyyur, app_context, venues):
+  total, counts = facets(fyyur)
+  assert total == 3
+  assert counts == {
+      "state": {'NY': 2, 'CA': 1},
+      "city": {'New York, NY': 2, 'Los Angeles, CA': 1},
+      "genres": {'Jazz': 2, 'Blues': 2},
+      "seeking": {'Yes': 2, 'No': 1},
+  }
+
+
+def test_group_counts_ignore_their_own_filter(fyyur, app_context, venues):
+  total, counts = facets(fyyur, state='NY')
+  assert total == 2
+  # Other states stay visible so the filter can be switched.
+  assert counts["state"] == {'NY': 2, 'CA': 1}
+  assert counts["city"] == {'New York, NY': 2}
+  assert counts["genres"] == {'Jazz': 2, 'Blues': 1}
+  assert counts["seeking"] == {'Yes': 1, 'No': 1}
+
+
+def test_combined_filters(fyyur, app_context, venues):
+  total, counts = facets(fyyur, genres='Blues', seeking='yes')
+  assert total == 1
+  assert counts["genres"] == {'Jazz': 1, 'Blues': 1}
+  assert counts["seeking"] == {'Yes': 1, 'No': 1}
+  assert counts["state"] == {'CA': 1}
+
+
+def test_search_page_lists_matches(fyyur, client, venues):
+  response = client.get(f'/venues/search?search_term={TERM}&state=NY')
+  assert response.status_code == 200
+  page = response.get_data(as_text=True)
+  assert 'Facetcase A' in page and 'Facetcase B' in page
+  assert 'Facetcase C' not in page
+
+
+def test_faceted_search_results(fyyur, app_context, venues):
+  result = fyyur.faceted_search('venues', TERM, fyyur.search_filters(MultiDict({"city": 'New York'})))
+  assert result["count"] == 2
+  assert sorted(row["name"] for row in result["data"]) == ['Facetcase A', 'Facetcase B']
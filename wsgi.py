@@ -0,0 +1,69 @@
+#----------------------------------------------------------------------------#
+# Production entry point.
+#
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Importing this module runs a startup self-check (unless
+# STARTUP_SELF_CHECK=0) so a misconfigured deployment fails at boot -- in
+# the gunicorn master when the app is preloaded -- instead of on the first
+# request. Worker and thread counts are checked by the gunicorn.conf.py
+# on_starting hook, which sees the settings gunicorn resolved.
+#----------------------------------------------------------------------------#
+
+import os
+
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+
+from app import app, autocomplete, db, genre_cache
+
+MIGRATIONS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+
+def self_check():
+  """Raise RuntimeError listing every problem that would break serving."""
+  problems = []
+
+  if not app.debug and not os.environ.get('SECRET_KEY'):
+    problems.append(
+        'SECRET_KEY is not set: every worker would sign sessions with its own '
+        'random key, so flashed messages and CSRF tokens fail across workers.'
+    )
+
+  with app.app_context():
+    try:
+      with db.engine.connect() as connection:
+        current = set(MigrationContext.configure(connection).get_current_heads())
+    except Exception as e:
+      problems.append(f'Database {db.engine.url!r} is not reachable: {e}')
+    else:
+      expected = set(ScriptDirectory(MIGRATIONS_DIRECTORY).get_heads())
+      if current != expected:
+        problems.append(
+            f'Database schema is at {sorted(current) or "no revision"}, expected {sorted(expected)}; '
+            'run "flask db upgrade".'
+        )
+    finally:
+      # Do not hand connections opened here to forked workers.
+      db.engine.dispose()
+
+  if problems:
+    raise RuntimeError('Startup self-check failed:\n  ' + '\n  '.join(problems))
+  app.logger.info('Startup self-check passed')
+
+
+if app.config['STARTUP_SELF_CHECK']:
+  self_check()
+
+# Load the genre cache and the autocomplete name indexes here, in the master
+# when preloaded, so forked workers start with them instead of each reading
+# the tables.
+with app.app_context():
+  try:
+    genre_cache.load()
+    autocomplete.refresh()
+  except Exception:
+    app.logger.exception('Loading the in-process caches failed; workers load them on first use')
+  finally:
+    db.session.remove()
+    db.engine.dispose()